@@ -10,14 +10,38 @@ MEGALEILÕES - SCRIPT DE MONITORAMENTO
 """
 
 import os
+import abc
+import json
+import argparse
 import time
 import re
-from datetime import datetime, timezone
+import random
+import asyncio
+import importlib.util
+import functools
+import contextlib
+import zlib
+import socket
+import sqlite3
+import threading
+import queue
+import uuid
+from collections import deque
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
 from zoneinfo import ZoneInfo
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, NamedTuple, Callable
 from supabase import create_client, Client
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
+from playwright.async_api import async_playwright
+from bs4 import BeautifulSoup, SoupStrainer, Tag, NavigableString, CData
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
 
 
 def convert_brazilian_datetime_to_postgres(date_str: str) -> Optional[str]:
@@ -31,6 +55,2156 @@ def convert_brazilian_datetime_to_postgres(date_str: str) -> Optional[str]:
         return None
 
 
+class ParserBackend(abc.ABC):
+    """Interface mínima sobre a árvore HTML usada pelo parse de cards e paginação"""
+    
+    name = ''
+    
+    @abc.abstractmethod
+    def parse(self, html: str):
+        ...
+    
+    @abc.abstractmethod
+    def select(self, node, css: str) -> list:
+        ...
+    
+    @abc.abstractmethod
+    def select_one(self, node, css: str):
+        ...
+    
+    @abc.abstractmethod
+    def attr(self, node, name: str) -> str:
+        ...
+    
+    @abc.abstractmethod
+    def text(self, node, separator: str = '') -> str:
+        """Texto do nó com cada pedaço já sem espaços nas pontas"""
+    
+    @abc.abstractmethod
+    def parent(self, node, tag: str):
+        """Ancestral mais próximo com a tag pedida"""
+    
+    def contains(self, node, pattern) -> bool:
+        """Algum texto do nó casa com a regex"""
+        return pattern.search(self.text(node, ' ')) is not None
+
+
+class SoupParserBackend(ParserBackend):
+    """BeautifulSoup (html.parser ou lxml); strainer=True monta árvore só dos cards e da paginação"""
+    
+    STRAINED_CLASSES = {'card', 'pagination'}
+    
+    def __init__(self, features: str = 'html.parser', strainer: bool = False):
+        self.features = features
+        self.strainer = SoupStrainer(['div', 'ul'], class_=self._strained_class) if strainer else None
+        self.name = features + ('+strainer' if strainer else '')
+    
+    @classmethod
+    def _strained_class(cls, value: Optional[str]) -> bool:
+        # Durante o parse o atributo class ainda chega como string crua ("card open")
+        return bool(value) and not cls.STRAINED_CLASSES.isdisjoint(value.split())
+    
+    def parse(self, html: str):
+        return BeautifulSoup(html, self.features, parse_only=self.strainer)
+    
+    def select(self, node, css: str) -> list:
+        return node.select(css)
+    
+    def select_one(self, node, css: str):
+        return node.select_one(css)
+    
+    def attr(self, node, name: str) -> str:
+        return node.get(name, '')
+    
+    def text(self, node, separator: str = '') -> str:
+        return node.get_text(separator=separator, strip=True)
+    
+    def parent(self, node, tag: str):
+        return node.find_parent(tag)
+
+
+class SelectolaxParserBackend(ParserBackend):
+    """selectolax/lexbor - parser em C; já é rápido o bastante para dispensar o strainer"""
+    
+    name = 'selectolax'
+    
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self._parser = LexborHTMLParser
+    
+    def parse(self, html: str):
+        return self._parser(html)
+    
+    def select(self, node, css: str) -> list:
+        return node.css(css)
+    
+    def select_one(self, node, css: str):
+        return node.css_first(css)
+    
+    def attr(self, node, name: str) -> str:
+        return node.attributes.get(name) or ''
+    
+    def text(self, node, separator: str = '') -> str:
+        return node.text(separator=separator, strip=True)
+    
+    def parent(self, node, tag: str):
+        current = node.parent
+        while current is not None:
+            if current.tag == tag:
+                return current
+            current = current.parent
+        return None
+    
+    def contains(self, node, pattern) -> bool:
+        # text() do lexbor inclui <script>/<style>; só confere nó a nó quando o atalho casa
+        if pattern.search(self.text(node, ' ')) is None:
+            return False
+        for child in node.traverse(include_text=True):
+            if child.tag == '-text' and child.parent.tag not in ('script', 'style') \
+                    and pattern.search(child.text_content or ''):
+                return True
+        return False
+
+
+# Módulo exigido por cada backend (None = sempre disponível)
+PARSER_BACKEND_MODULES = {
+    'html.parser': None,
+    'lxml': 'lxml',
+    'selectolax': 'selectolax',
+}
+
+
+def parser_backend_available(spec: str) -> bool:
+    """'lxml+strainer' -> lxml instalado?"""
+    name = spec.split('+')[0]
+    if name not in PARSER_BACKEND_MODULES:
+        return False
+    module = PARSER_BACKEND_MODULES[name]
+    return module is None or importlib.util.find_spec(module) is not None
+
+
+@functools.lru_cache(maxsize=None)
+def get_parser_backend(spec: str) -> ParserBackend:
+    """Instância (cacheada por processo) do backend: 'html.parser', 'lxml', 'selectolax', '+strainer'"""
+    name, _, option = spec.partition('+')
+    if name not in PARSER_BACKEND_MODULES or option not in ('', 'strainer'):
+        raise ValueError(f"❌ Backend de parser inválido: {spec}")
+    
+    if name == 'selectolax':
+        return SelectolaxParserBackend()
+    return SoupParserBackend(name, strainer=option == 'strainer')
+
+
+def get_max_page(soup, backend: 'ParserBackend') -> int:
+    """Detecta número máximo de páginas"""
+    try:
+        last_link = backend.select_one(soup, 'ul.pagination li.last a')
+        last_href = backend.attr(last_link, 'href') if last_link else None
+        page_hrefs = [backend.attr(link, 'href') for link in backend.select(soup, 'ul.pagination li a[data-page]')]
+        return max_page_from_hrefs(last_href, page_hrefs)
+    except Exception:
+        return 1
+
+
+def max_page_from_hrefs(last_href: Optional[str], page_hrefs: List[str]) -> int:
+    """Link "última" primeiro; senão o maior ?pagina=N entre os links numerados"""
+    if last_href:
+        match = re.search(r'pagina=(\d+)', last_href)
+        if match:
+            return int(match.group(1))
+    
+    pages = []
+    for href in page_hrefs:
+        match = re.search(r'pagina=(\d+)', href)
+        if match:
+            pages.append(int(match.group(1)))
+    if pages:
+        return max(pages)
+    
+    return 1
+
+
+def parse_card_legacy(card, base_url: str, backend: 'ParserBackend') -> Optional[Dict]:
+    """Parse de um card - implementação original, mantida como referência do `bench-parse`"""
+    try:
+        # 1. Link (obrigatório para match)
+        link_elem = backend.select_one(card, 'a[href]')
+        if not link_elem:
+            return None
+        
+        link = backend.attr(link_elem, 'href')
+        if not link or 'javascript' in link.lower():
+            return None
+        
+        if not link.startswith('http'):
+            link = f"{base_url}{link}"
+        
+        link_clean = link.split('?')[0].rstrip('/')
+        
+        # 2. Extrai informações de praça
+        auction_info = extract_auction_info_from_html(card, backend)
+        
+        # 3. Has bid
+        has_bid = extract_has_bid(card, backend)
+        
+        # 4. Valor
+        value = auction_info.get('current_value')
+        
+        # 5. Is active (se tem data de leilão no futuro ou está "aberto para lances")
+        is_active = True
+        texto = backend.text(card, ' ').lower()
+        if 'encerrado' in texto or 'finalizado' in texto:
+            is_active = False
+        
+        return {
+            'link': link_clean,
+            'value': value,
+            'has_bid': has_bid,
+            'auction_round': auction_info.get('auction_round'),
+            'auction_date': auction_info.get('auction_date'),
+            'first_round_value': auction_info.get('first_round_value'),
+            'first_round_date': auction_info.get('first_round_date'),
+            'discount_percentage': auction_info.get('discount_percentage'),
+            'is_active': is_active,
+        }
+    
+    except Exception:
+        return None
+
+
+def extract_has_bid(card, backend: 'ParserBackend') -> bool:
+    """Verifica se tem lances"""
+    try:
+        legal_icon = backend.select_one(card, 'i.fa-legal')
+        if legal_icon:
+            parent_span = backend.parent(legal_icon, 'span')
+            if parent_span:
+                text = backend.text(parent_span)
+                numbers = re.findall(r'\d+', text)
+                if numbers:
+                    return int(numbers[0]) > 0
+        return False
+    except Exception:
+        return False
+
+
+def extract_auction_info_from_html(card, backend: 'ParserBackend') -> Dict:
+    """Extrai informações de praça"""
+    info = {
+        'auction_round': None,
+        'auction_date': None,
+        'current_value': None,
+        'first_round_value': None,
+        'first_round_date': None,
+        'discount_percentage': None,
+    }
+    
+    active_instance = backend.select_one(card, '.instance.active')
+    
+    if active_instance:
+        second_date = backend.select_one(active_instance, '.card-second-instance-date')
+        first_date = backend.select_one(active_instance, '.card-first-instance-date')
+        
+        if second_date:
+            info['auction_round'] = 2
+            date_text = backend.text(second_date)
+            date_match = re.search(r'(\d{2}/\d{2}/\d{4})\s*às\s*(\d{2}:\d{2})', date_text)
+            if date_match:
+                date_str = f"{date_match.group(1)} {date_match.group(2)}"
+                info['auction_date'] = convert_brazilian_datetime_to_postgres(date_str)
+        elif first_date:
+            info['auction_round'] = 1
+            date_text = backend.text(first_date)
+            date_match = re.search(r'(\d{2}/\d{2}/\d{4})\s*às\s*(\d{2}:\d{2})', date_text)
+            if date_match:
+                date_str = f"{date_match.group(1)} {date_match.group(2)}"
+                info['auction_date'] = convert_brazilian_datetime_to_postgres(date_str)
+        
+        value_elem = backend.select_one(active_instance, '.card-instance-value')
+        if value_elem:
+            value_text = backend.text(value_elem)
+            value_match = re.search(r'R\$\s*([\d.]+,\d{2})', value_text)
+            if value_match:
+                try:
+                    info['current_value'] = float(value_match.group(1).replace('.', '').replace(',', '.'))
+                except:
+                    pass
+    
+    first_instance = backend.select_one(card, '.instance.first.passed')
+    if first_instance:
+        date_elem = backend.select_one(first_instance, '.card-first-instance-date')
+        if date_elem:
+            date_text = backend.text(date_elem)
+            date_match = re.search(r'(\d{2}/\d{2}/\d{4})\s*às\s*(\d{2}:\d{2})', date_text)
+            if date_match:
+                date_str = f"{date_match.group(1)} {date_match.group(2)}"
+                info['first_round_date'] = convert_brazilian_datetime_to_postgres(date_str)
+        
+        value_elem = backend.select_one(first_instance, '.card-instance-value')
+        if value_elem:
+            value_text = backend.text(value_elem)
+            value_match = re.search(r'R\$\s*([\d.]+,\d{2})', value_text)
+            if value_match:
+                try:
+                    info['first_round_value'] = float(value_match.group(1).replace('.', '').replace(',', '.'))
+                except:
+                    pass
+    
+    if info['first_round_value'] and info['current_value'] and info['auction_round'] == 2:
+        try:
+            discount = ((info['first_round_value'] - info['current_value']) / info['first_round_value']) * 100
+            info['discount_percentage'] = round(discount, 2)
+        except:
+            pass
+    
+    return info
+
+
+class CardField(NamedTuple):
+    """Um campo do card: escopo, seletor, origem (text / attr:X / parent-text:tag), regex, conversor e grupo
+    de alternativas (campos do mesmo grupo são mutuamente exclusivos: só conta falha se nenhum for achado)"""
+    name: str
+    scope: Optional[str]
+    selector: str
+    source: str = 'text'
+    pattern: Optional[str] = None
+    converter: Optional[str] = None
+    group: Optional[str] = None
+
+
+DATE_PATTERN = r'(\d{2}/\d{2}/\d{4})\s*às\s*(\d{2}:\d{2})'
+MONEY_PATTERN = r'R\$\s*([\d.]+,\d{2})'
+CLOSED_PATTERN = re.compile(r'encerrado|finalizado', re.IGNORECASE)
+
+# Campos lidos de cada card - adicionar um campo é adicionar uma linha aqui
+CARD_FIELDS = (
+    CardField('link', None, 'a[href]', 'attr:href'),
+    CardField('active_second_date', '.instance.active', '.card-second-instance-date', 'text', DATE_PATTERN, 'datetime',
+              'active_date'),
+    CardField('active_first_date', '.instance.active', '.card-first-instance-date', 'text', DATE_PATTERN, 'datetime',
+              'active_date'),
+    CardField('current_value', '.instance.active', '.card-instance-value', 'text', MONEY_PATTERN, 'money'),
+    CardField('first_round_date', '.instance.first.passed', '.card-first-instance-date', 'text', DATE_PATTERN, 'datetime'),
+    CardField('first_round_value', '.instance.first.passed', '.card-instance-value', 'text', MONEY_PATTERN, 'money'),
+    CardField('bid_count', None, 'i.fa-legal', 'parent-text:span', r'\d+', 'int'),
+)
+
+
+def _convert_datetime(match) -> Optional[str]:
+    return convert_brazilian_datetime_to_postgres(f"{match.group(1)} {match.group(2)}")
+
+
+def _convert_money(match) -> Optional[float]:
+    return float(match.group(1).replace('.', '').replace(',', '.'))
+
+
+def _convert_int(match) -> int:
+    return int(match.group(0))
+
+
+CARD_CONVERTERS = {
+    'datetime': _convert_datetime,
+    'money': _convert_money,
+    'int': _convert_int,
+}
+
+
+SIMPLE_SELECTOR_PATTERN = re.compile(r'^([a-zA-Z][\w-]*)?((?:\.[\w-]+)*)((?:\[[\w-]+\])*)$')
+
+
+class SimpleSelector(NamedTuple):
+    """Seletor tag.classe[attr] compilado para um teste direto sobre o elemento"""
+    css: str
+    tag: Optional[str]
+    classes: tuple
+    attrs: tuple
+    
+    @classmethod
+    def compile(cls, css: str) -> 'SimpleSelector':
+        match = SIMPLE_SELECTOR_PATTERN.match(css)
+        if not match:
+            raise ValueError(f"❌ Seletor não suportado pelo plano de extração: {css}")
+        tag, classes, attrs = match.groups()
+        return cls(
+            css,
+            tag,
+            tuple(c for c in classes.split('.') if c),
+            tuple(a.strip('[]') for a in re.findall(r'\[[\w-]+\]', attrs)),
+        )
+    
+    def matches(self, tag: str, classes, attrs) -> bool:
+        return ((self.tag is None or self.tag == tag)
+                and all(c in classes for c in self.classes)
+                and all(a in attrs for a in self.attrs))
+
+
+class CompiledField(NamedTuple):
+    name: str
+    scope: Optional[str]
+    selector: SimpleSelector
+    kind: str
+    arg: str
+    pattern: Optional[re.Pattern]
+    converter: Optional[Callable]
+
+
+class CardExtractionPlan:
+    """CARD_FIELDS compilado uma vez: seletores e regex prontos, extração numa passada única pelo card"""
+    
+    def __init__(self, fields=CARD_FIELDS):
+        self.field_names = [field.name for field in fields]
+        # Chave de falha de seletor -> campos que a satisfazem (grupo de alternativas ou o próprio campo)
+        self.miss_keys: Dict[str, List[str]] = {}
+        for field in fields:
+            self.miss_keys.setdefault(field.group or field.name, []).append(field.name)
+        self.fields: List[CompiledField] = []
+        for field in fields:
+            kind, _, arg = field.source.partition(':')
+            if kind not in ('text', 'attr', 'parent-text'):
+                raise ValueError(f"❌ Origem inválida para o campo {field.name}: {field.source}")
+            
+            self.fields.append(CompiledField(
+                field.name,
+                field.scope,
+                SimpleSelector.compile(field.selector),
+                kind,
+                arg,
+                re.compile(field.pattern) if field.pattern else None,
+                CARD_CONVERTERS[field.converter] if field.converter else None,
+            ))
+        
+        self.scopes = {f.scope: SimpleSelector.compile(f.scope) for f in self.fields if f.scope is not None}
+        self.parent_tags = {f.arg for f in self.fields if f.kind == 'parent-text'}
+    
+    def extract(self, card, backend: 'ParserBackend', misses: Optional[Dict[str, int]] = None):
+        """Retorna (valores, campos encontrados, card encerrado); seletores que falham contam em misses"""
+        values = dict.fromkeys(self.field_names)
+        found = set()
+        
+        if isinstance(backend, SoupParserBackend):
+            is_closed = self._walk_soup(card, backend, values, found)
+        else:
+            self._select_each(card, backend, values, found)
+            is_closed = backend.contains(card, CLOSED_PATTERN)
+        
+        if misses is not None:
+            self.count_misses(found, misses)
+        
+        return values, found, is_closed
+    
+    def count_misses(self, found: set, misses: Dict[str, int]):
+        """Uma falha por campo (ou grupo de alternativas) sem nenhum seletor achado"""
+        for key, names in self.miss_keys.items():
+            if not any(name in found for name in names):
+                misses[key] = misses.get(key, 0) + 1
+    
+    def _select_each(self, card, backend: 'ParserBackend', values: Dict, found: set):
+        """Backends com seletor nativo rápido (selectolax): um select por escopo e por campo"""
+        scope_nodes = {None: card}
+        for field in self.fields:
+            if field.scope not in scope_nodes:
+                scope_nodes[field.scope] = backend.select_one(card, field.scope)
+            root = scope_nodes[field.scope]
+            
+            node = backend.select_one(root, field.selector.css) if root is not None else None
+            if node is not None and field.kind == 'parent-text':
+                node = backend.parent(node, field.arg)
+            if node is not None:
+                self._take(field, node, backend, values, found)
+    
+    def _walk_soup(self, card, backend: 'ParserBackend', values: Dict, found: set) -> bool:
+        """BeautifulSoup: percorre o card uma vez testando todos os seletores (o soupsieve varreria N vezes)"""
+        pending = {scope: [f for f in self.fields if f.scope == scope] for scope in [None, *self.scopes]}
+        chosen_scopes = set()
+        is_closed = False
+        
+        def walk(node, open_scopes, ancestors):
+            nonlocal is_closed
+            for child in node.children:
+                child_type = type(child)
+                if child_type is NavigableString or child_type is CData:
+                    # Mesmo critério do get_text(): só texto "de verdade" (sem comentários/scripts)
+                    if not is_closed and CLOSED_PATTERN.search(child):
+                        is_closed = True
+                    continue
+                if child_type is not Tag:
+                    continue
+                
+                tag = child.name
+                attrs = child.attrs
+                classes = attrs.get('class') or ()
+                
+                for scope in open_scopes:
+                    fields = pending[scope]
+                    for field in fields[:]:
+                        if field.selector.matches(tag, classes, attrs):
+                            fields.remove(field)
+                            node_for_field = child
+                            if field.kind == 'parent-text':
+                                node_for_field = next((a for a in reversed(ancestors) if a.name == field.arg), None)
+                                if node_for_field is None:
+                                    node_for_field = backend.parent(child, field.arg)
+                            if node_for_field is not None:
+                                self._take(field, node_for_field, backend, values, found)
+                
+                # select_one(card, escopo) = primeiro elemento que casa, em ordem de documento
+                child_scopes = open_scopes
+                for scope, selector in self.scopes.items():
+                    if scope not in chosen_scopes and selector.matches(tag, classes, attrs):
+                        chosen_scopes.add(scope)
+                        child_scopes = child_scopes + (scope,)
+                
+                if child.contents:
+                    walk(child, child_scopes, ancestors + (child,) if tag in self.parent_tags else ancestors)
+        
+        walk(card, (None,), ())
+        return is_closed
+    
+    def convert_raw(self, raw_values: Dict[str, Optional[str]], misses: Optional[Dict[str, int]] = None):
+        """Mesmo plano sobre valores brutos já extraídos no browser (None = seletor não achou)"""
+        values = dict.fromkeys(self.field_names)
+        found = set()
+        for field in self.fields:
+            raw = raw_values.get(field.name)
+            if raw is None:
+                continue
+            found.add(field.name)
+            self._convert(field, raw, values)
+        if misses is not None:
+            self.count_misses(found, misses)
+        return values, found
+    
+    @property
+    def browser_fields(self) -> List[list]:
+        """Campos no formato consumido por CARD_EXTRACT_JS"""
+        return [[f.name, f.scope, f.selector.css, f.kind, f.arg] for f in self.fields]
+    
+    def _take(self, field: CompiledField, node, backend: 'ParserBackend', values: Dict, found: set):
+        """Lê o valor bruto do nó e aplica regex + conversor"""
+        found.add(field.name)
+        self._convert(field, backend.attr(node, field.arg) if field.kind == 'attr' else backend.text(node), values)
+    
+    def _convert(self, field: CompiledField, raw: str, values: Dict):
+        if field.pattern is None:
+            values[field.name] = raw
+            return
+        
+        match = field.pattern.search(raw)
+        if match is None:
+            return
+        try:
+            values[field.name] = field.converter(match) if field.converter else match.group(0)
+        except (ValueError, TypeError):
+            pass
+
+
+CARD_PLAN = CardExtractionPlan()
+
+# Extração dentro do Chromium ($$eval em div.card): devolve só os valores brutos de cada campo do
+# CARD_PLAN; regex e conversão continuam no Python (CardExtractionPlan.convert_raw). O texto segue o
+# get_text(strip=True) do BeautifulSoup: nós de texto sem script/style, aparados e concatenados.
+CARD_EXTRACT_JS = """
+(cards, [fields, closedPattern]) => {
+    const closed = new RegExp(closedPattern, 'i');
+    const texts = (node) => {
+        const out = [];
+        const walker = document.createTreeWalker(node, NodeFilter.SHOW_TEXT, {
+            acceptNode: (t) => (t.parentElement && t.parentElement.closest('script, style'))
+                ? NodeFilter.FILTER_REJECT : NodeFilter.FILTER_ACCEPT,
+        });
+        while (walker.nextNode()) {
+            const s = walker.currentNode.nodeValue.trim();
+            if (s) out.push(s);
+        }
+        return out;
+    };
+    return cards.map((card) => {
+        const raw = {};
+        const scopes = {};
+        for (const [name, scope, selector, kind, arg] of fields) {
+            let root = card;
+            if (scope !== null) {
+                if (!(scope in scopes)) scopes[scope] = card.querySelector(scope);
+                root = scopes[scope];
+            }
+            let node = root ? root.querySelector(selector) : null;
+            if (node && kind === 'parent-text') {
+                node = node.parentElement ? node.parentElement.closest(arg) : null;
+            }
+            if (!node) {
+                raw[name] = null;
+            } else if (kind === 'attr') {
+                raw[name] = node.getAttribute(arg) || '';
+            } else {
+                raw[name] = texts(node).join('');
+            }
+        }
+        return {raw, closed: texts(card).some((t) => closed.test(t))};
+    });
+}
+"""
+
+PAGINATION_EXTRACT_JS = """
+() => {
+    const last = document.querySelector('ul.pagination li.last a');
+    return {
+        last: last ? (last.getAttribute('href') || '') : null,
+        pages: Array.from(document.querySelectorAll('ul.pagination li a[data-page]'), (a) => a.getAttribute('href') || ''),
+    };
+}
+"""
+
+
+async def extract_listing_in_browser(page) -> Dict:
+    """Cards e paginação direto do DOM, sem page.content() nem re-parse no Python"""
+    cards = await page.eval_on_selector_all(
+        'div.card', CARD_EXTRACT_JS, [CARD_PLAN.browser_fields, CLOSED_PATTERN.pattern]
+    )
+    pagination = await page.evaluate(PAGINATION_EXTRACT_JS)
+    return {'cards': cards, 'pagination': pagination}
+
+
+def parse_extracted_listing(extracted: Dict, base_url: str) -> 'ParsedPage':
+    """Normaliza o JSON do browser (datas, moeda) no mesmo formato do parse_listing_html"""
+    started = time.perf_counter()
+    misses = {}
+    items = []
+    for card in extracted['cards']:
+        try:
+            values, found = CARD_PLAN.convert_raw(card['raw'], misses)
+            item = build_card_item(values, found, base_url, card['closed'])
+        except Exception:
+            item = None
+        if item:
+            items.append(item)
+    
+    pagination = extracted['pagination']
+    max_page = max_page_from_hrefs(pagination['last'], pagination['pages'])
+    return ParsedPage(max_page, len(extracted['cards']), items, time.perf_counter() - started, misses)
+
+
+def parse_card(card, base_url: str, backend: 'ParserBackend', misses: Optional[Dict[str, int]] = None) -> Optional[Dict]:
+    """Parse de um card - versão simplificada focada em dados de monitoramento"""
+    try:
+        values, found, is_closed = CARD_PLAN.extract(card, backend, misses)
+        return build_card_item(values, found, base_url, is_closed)
+    except Exception:
+        return None
+
+
+def build_card_item(values: Dict, found, base_url: str, is_closed: bool) -> Optional[Dict]:
+    """Monta o item a partir dos campos extraídos (mesmo formato do parse original)"""
+    # 1. Link (obrigatório para match)
+    link = values['link']
+    if not link or 'javascript' in link.lower():
+        return None
+    
+    if not link.startswith('http'):
+        link = f"{base_url}{link}"
+    
+    link_clean = link.split('?')[0].rstrip('/')
+    
+    # 2. Praça ativa: 2ª praça tem precedência sobre a 1ª
+    auction_round = None
+    auction_date = None
+    if 'active_second_date' in found:
+        auction_round = 2
+        auction_date = values['active_second_date']
+    elif 'active_first_date' in found:
+        auction_round = 1
+        auction_date = values['active_first_date']
+    
+    current_value = values['current_value']
+    first_round_value = values['first_round_value']
+    
+    discount_percentage = None
+    if first_round_value and current_value and auction_round == 2:
+        discount_percentage = round(((first_round_value - current_value) / first_round_value) * 100, 2)
+    
+    return {
+        'link': link_clean,
+        'value': current_value,
+        'has_bid': (values['bid_count'] or 0) > 0,
+        'auction_round': auction_round,
+        'auction_date': auction_date,
+        'first_round_value': first_round_value,
+        'first_round_date': values['first_round_date'],
+        'discount_percentage': discount_percentage,
+        'is_active': not is_closed,
+    }
+
+
+# Chaves aceitas nos payloads JSON de listagem (XHR/fetch do próprio site), em ordem de preferência
+JSON_LINK_KEYS = ('link', 'url', 'href', 'permalink')
+JSON_VALUE_KEYS = ('current_value', 'valor_atual', 'lance_atual', 'valor', 'value', 'price')
+JSON_BID_KEYS = ('bid_count', 'total_lances', 'qtd_lances', 'lances', 'bids')
+JSON_ROUND_KEYS = ('auction_round', 'praca_atual', 'praca', 'instance')
+JSON_DATE_KEYS = ('auction_date', 'data_praca', 'data_leilao')
+JSON_FIRST_VALUE_KEYS = ('first_round_value', 'valor_1_praca', 'valor_primeira_praca', 'first_instance_value')
+JSON_FIRST_DATE_KEYS = ('first_round_date', 'data_1_praca', 'data_primeira_praca', 'first_instance_date')
+JSON_ACTIVE_KEYS = ('is_active', 'ativo', 'active')
+JSON_STATUS_KEYS = ('status', 'situacao')
+JSON_LAST_PAGE_KEYS = ('last_page', 'lastPage', 'total_pages', 'totalPages', 'page_count', 'pageCount')
+
+
+def _json_first(record: Dict, keys):
+    for key in keys:
+        if record.get(key) not in (None, ''):
+            return record[key]
+    return None
+
+
+def _json_money(value) -> Optional[float]:
+    """Número puro ou texto "R$ 1.234,56" """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r'([\d.]+,\d{2})', str(value))
+    if match:
+        return float(match.group(1).replace('.', '').replace(',', '.'))
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _json_datetime(value) -> Optional[str]:
+    """ISO (com ou sem fuso - sem fuso é horário de Brasília) ou DD/MM/YYYY HH:MM"""
+    if not isinstance(value, str):
+        return None
+    match = re.search(DATE_PATTERN, value) or re.search(r'(\d{2}/\d{2}/\d{4})\s+(\d{2}:\d{2})', value)
+    if match:
+        return convert_brazilian_datetime_to_postgres(f"{match.group(1)} {match.group(2)}")
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=ZoneInfo('America/Sao_Paulo'))
+    return dt.isoformat()
+
+
+def _looks_like_listing_record(record) -> bool:
+    if not isinstance(record, dict):
+        return False
+    link = _json_first(record, JSON_LINK_KEYS)
+    return isinstance(link, str) and (link.startswith('/') or 'megaleiloes' in link) \
+        and _json_first(record, JSON_VALUE_KEYS) is not None
+
+
+def find_listing_records(data) -> Optional[List[Dict]]:
+    """A maior lista do JSON com registros com cara de lote (link + valor) - banners e destaques menores ficam de fora"""
+    candidates = []
+    _collect_listing_records(data, 0, candidates)
+    return max(candidates, key=len) if candidates else None
+
+
+def _collect_listing_records(data, depth: int, candidates: List[List[Dict]]):
+    if depth > 4:
+        return
+    if isinstance(data, list):
+        records = [r for r in data if isinstance(r, dict)]
+        if records and sum(map(_looks_like_listing_record, records)) >= max(1, len(records) // 2):
+            candidates.append(records)
+    elif isinstance(data, dict):
+        for value in data.values():
+            _collect_listing_records(value, depth + 1, candidates)
+
+
+def find_json_last_page(data, depth: int = 0) -> Optional[int]:
+    """Total de páginas anunciado pelo payload, se houver"""
+    if depth > 3 or not isinstance(data, dict):
+        return None
+    for key in JSON_LAST_PAGE_KEYS:
+        if isinstance(data.get(key), int) and not isinstance(data[key], bool):
+            return data[key]
+    for value in data.values():
+        found = find_json_last_page(value, depth + 1)
+        if found:
+            return found
+    return None
+
+
+def _json_has(record: Dict, keys) -> bool:
+    return any(key in record for key in keys)
+
+
+def item_from_json_record(record: Dict, base_url: str) -> Optional[Dict]:
+    """Registro JSON -> item no formato do parse_card; campos que o payload não traz ficam fora do item
+    (o match completa com os valores da base em vez de gravar null por cima)"""
+    link = _json_first(record, JSON_LINK_KEYS)
+    if not isinstance(link, str) or not link or 'javascript' in link.lower():
+        return None
+    if not link.startswith('http'):
+        link = f"{base_url}{link}"
+    
+    bids = _json_first(record, JSON_BID_KEYS)
+    if isinstance(bids, list):
+        bids = len(bids)
+    try:
+        has_bid = int(bids or 0) > 0
+    except (TypeError, ValueError):
+        has_bid = False
+    
+    auction_round = _json_first(record, JSON_ROUND_KEYS)
+    try:
+        auction_round = int(auction_round) if auction_round is not None else None
+    except (TypeError, ValueError):
+        auction_round = None
+    
+    value = _json_money(_json_first(record, JSON_VALUE_KEYS))
+    first_round_value = _json_money(_json_first(record, JSON_FIRST_VALUE_KEYS))
+    discount_percentage = None
+    if first_round_value and value and auction_round == 2:
+        discount_percentage = round(((first_round_value - value) / first_round_value) * 100, 2)
+    
+    is_active = _json_first(record, JSON_ACTIVE_KEYS)
+    if not isinstance(is_active, bool):
+        status = str(_json_first(record, JSON_STATUS_KEYS) or '')
+        is_active = CLOSED_PATTERN.search(status) is None
+    
+    item = {
+        'link': link.split('?')[0].rstrip('/'),
+        'value': value,
+        'has_bid': has_bid,
+        'auction_round': auction_round,
+        'auction_date': _json_datetime(_json_first(record, JSON_DATE_KEYS)),
+        'first_round_value': first_round_value,
+        'first_round_date': _json_datetime(_json_first(record, JSON_FIRST_DATE_KEYS)),
+        'discount_percentage': discount_percentage,
+        'is_active': is_active,
+    }
+    carried = {
+        'has_bid': JSON_BID_KEYS,
+        'auction_round': JSON_ROUND_KEYS,
+        'auction_date': JSON_DATE_KEYS,
+        'first_round_value': JSON_FIRST_VALUE_KEYS,
+        'first_round_date': JSON_FIRST_DATE_KEYS,
+        'discount_percentage': JSON_FIRST_VALUE_KEYS,
+        'is_active': JSON_ACTIVE_KEYS + JSON_STATUS_KEYS,
+    }
+    for field, keys in carried.items():
+        if not _json_has(record, keys):
+            del item[field]
+    return item
+
+
+async def capture_listing_payload(responses: list, url_pattern: Optional[re.Pattern] = None) -> Optional[Dict]:
+    """Resposta XHR/fetch JSON da navegação com a maior lista de lotes (opcionalmente só de URLs conhecidas)"""
+    best = None
+    for response in responses:
+        try:
+            if response.request.resource_type not in ('xhr', 'fetch') or response.status != 200:
+                continue
+            if url_pattern is not None and not url_pattern.search(response.url):
+                continue
+            if 'json' not in (await response.header_value('content-type') or ''):
+                continue
+            data = await response.json()
+        except Exception:
+            continue
+        
+        records = find_listing_records(data)
+        if records and (best is None or len(records) > len(best['records'])):
+            best = {'url': response.url, 'records': records, 'last_page': find_json_last_page(data)}
+    return best
+
+
+def parse_captured_listing(captured: Dict, base_url: str) -> 'ParsedPage':
+    """Itens direto do payload JSON; total de páginas do payload ou, na falta, da paginação do DOM"""
+    started = time.perf_counter()
+    items = []
+    for record in captured['records']:
+        try:
+            item = item_from_json_record(record, base_url)
+        except Exception:
+            item = None
+        if item:
+            items.append(item)
+    
+    max_page = captured.get('last_page')
+    if not max_page:
+        pagination = captured.get('pagination') or {'last': None, 'pages': []}
+        max_page = max_page_from_hrefs(pagination['last'], pagination['pages'])
+    return ParsedPage(max_page, len(captured['records']), items, time.perf_counter() - started)
+
+
+class ParsedPage(NamedTuple):
+    """Resultado compacto do parse de uma página de listagem"""
+    max_page: int
+    card_count: int
+    items: List[Dict]
+    parse_seconds: float
+    selector_misses: Dict[str, int] = {}
+
+
+def parse_listing_html(html: str, base_url: str, backend_spec: str = 'html.parser', legacy: bool = False) -> ParsedPage:
+    """Parse completo de uma página: roda no processo principal ou num worker do pool"""
+    started = time.perf_counter()
+    backend = get_parser_backend(backend_spec)
+    root = backend.parse(html)
+    cards = backend.select(root, 'div.card')
+    
+    misses = {}
+    items = []
+    for card in cards:
+        item = parse_card_legacy(card, base_url, backend) if legacy else parse_card(card, base_url, backend, misses)
+        if item:
+            items.append(item)
+    
+    return ParsedPage(get_max_page(root, backend), len(cards), items, time.perf_counter() - started, misses)
+
+
+ALL_PARSER_BACKENDS = ('html.parser', 'html.parser+strainer', 'lxml', 'lxml+strainer', 'selectolax')
+
+
+async def _extract_pages_in_browser(pages: List[str], base_url: str) -> List['ParsedPage']:
+    """Roda o CARD_EXTRACT_JS do modo 'dom' sobre páginas gravadas"""
+    results = []
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=['--no-sandbox'])
+        page = await browser.new_page()
+        for html in pages:
+            await page.set_content(html, wait_until='domcontentloaded')
+            results.append(parse_extracted_listing(await extract_listing_in_browser(page), base_url))
+        await browser.close()
+    return results
+
+
+def benchmark_parsing(paths: List[str], workers: int, repeat: int = 5, backends=ALL_PARSER_BACKENDS,
+                      browser: bool = False, base_url: str = 'https://www.megaleiloes.com.br'):
+    """Paridade e throughput dos backends (e do modo dom) sobre páginas HTML gravadas, e speedup do pool"""
+    pages = []
+    for path in paths:
+        with open(path, encoding='utf-8') as fh:
+            pages.append(fh.read())
+    jobs = pages * repeat
+    
+    # Referência: o parse original (html.parser, árvore completa, card a card sem plano compilado)
+    reference = [parse_listing_html(html, base_url, 'html.parser', legacy=True) for html in pages]
+    
+    started = time.perf_counter()
+    for html in jobs:
+        parse_listing_html(html, base_url, 'html.parser', legacy=True)
+    legacy_seconds = time.perf_counter() - started
+    print(f"🧪 {'html.parser (original)':<22} {len(jobs) / legacy_seconds:8.1f} páginas/s | referência")
+    
+    timings = {}
+    for spec in backends:
+        if not parser_backend_available(spec):
+            print(f"⏭️ {spec}: não instalado")
+            continue
+        
+        mismatches = [
+            path for path, html, expected in zip(paths, pages, reference)
+            if parse_listing_html(html, base_url, spec)[:3] != expected[:3]
+        ]
+        
+        started = time.perf_counter()
+        for html in jobs:
+            parse_listing_html(html, base_url, spec)
+        timings[spec] = time.perf_counter() - started
+        
+        status = "✅ paridade" if not mismatches else f"❌ {len(mismatches)} páginas divergentes: {', '.join(mismatches)}"
+        print(f"🧪 {spec:<22} {len(jobs) / timings[spec]:8.1f} páginas/s | {status}")
+    
+    if browser:
+        extracted = asyncio.run(_extract_pages_in_browser(pages, base_url))
+        mismatches = [path for path, got, expected in zip(paths, extracted, reference) if got[:3] != expected[:3]]
+        status = "✅ paridade" if not mismatches else f"❌ {len(mismatches)} páginas divergentes: {', '.join(mismatches)}"
+        print(f"🧪 {'chromium $$eval':<22} {'':>8}             | {status}")
+    
+    if not timings:
+        return
+    
+    # Pool de processos com o backend mais rápido
+    spec = min(timings, key=timings.get)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        # Aquece os workers (import + spawn) fora da medição
+        list(pool.map(parse_listing_html, pages[:1] * workers, [base_url] * workers, [spec] * workers))
+        started = time.perf_counter()
+        list(pool.map(parse_listing_html, jobs, [base_url] * len(jobs), [spec] * len(jobs)))
+        pool_seconds = time.perf_counter() - started
+    print(f"🧪 {spec} + pool ({workers} workers): {len(jobs) / pool_seconds:.1f} páginas/s - "
+          f"speedup {timings[spec] / pool_seconds:.2f}x sobre o inline")
+
+
+def _env_list(name: str, default) -> List[str]:
+    """Lê uma variável de ambiente separada por vírgulas"""
+    value = os.getenv(name)
+    if not value:
+        return list(default)
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+
+class ListingReadiness:
+    """Espera a página de listagem ficar pronta por sinais reais (ou sleeps fixos no modo fallback)"""
+    
+    MODES = ('events', 'sleep')
+    
+    def __init__(self, mode: str = 'events', timeout_ms: int = 15000, idle_timeout_ms: int = 3000,
+                 stats: Optional[Dict] = None):
+        if mode not in self.MODES:
+            raise ValueError(f"❌ Modo de readiness inválido: {mode} (use {'/'.join(self.MODES)})")
+        
+        self.mode = mode
+        self.timeout_ms = timeout_ms
+        self.idle_timeout_ms = idle_timeout_ms
+        self.stats = stats if stats is not None else {}
+    
+    async def after_goto(self, page, expect_pagination: bool = False):
+        """Cards presentes e estáveis (e paginação renderizada, se pedida)"""
+        if self.mode == 'sleep':
+            await asyncio.sleep(3)
+            return
+        
+        if not await self._wait_cards_stable(page):
+            self._timeout('cards')
+        
+        if expect_pagination:
+            # Seções com uma única página não têm paginação - timeout curto e segue
+            try:
+                await page.wait_for_selector('ul.pagination', state='attached', timeout=min(self.timeout_ms, 3000))
+            except Exception:
+                self._timeout('pagination')
+    
+    async def after_scroll(self, page):
+        """Lazy-load disparado pelo scroll terminou (rede ociosa)"""
+        if self.mode == 'sleep':
+            await asyncio.sleep(2)
+            return
+        
+        # Widgets de terceiros podem nunca deixar a rede ociosa - timeout próprio, curto
+        try:
+            await page.wait_for_load_state('networkidle', timeout=self.idle_timeout_ms)
+        except Exception:
+            self._timeout('networkidle')
+    
+    async def page_pause(self):
+        """Pausa entre páginas - só existe no modo fallback"""
+        if self.mode == 'sleep':
+            await asyncio.sleep(2)
+    
+    async def _wait_cards_stable(self, page, interval: float = 0.25, checks: int = 2) -> bool:
+        """Aguarda div.card aparecer e a contagem parar de mudar"""
+        try:
+            await page.wait_for_selector('div.card', state='attached', timeout=self.timeout_ms)
+        except Exception:
+            return False
+        
+        deadline = time.monotonic() + self.timeout_ms / 1000
+        last_count = -1
+        stable = 0
+        while time.monotonic() < deadline:
+            count = await page.locator('div.card').count()
+            if count == last_count:
+                stable += 1
+                if stable >= checks:
+                    return True
+            else:
+                stable = 0
+            last_count = count
+            await asyncio.sleep(interval)
+        
+        return False
+    
+    def _timeout(self, signal: str):
+        """Conta esperas que estouraram o timeout"""
+        key = f'readiness_timeouts_{signal}'
+        self.stats[key] = self.stats.get(key, 0) + 1
+
+
+class ResourcePolicy:
+    """Política de recursos do browser: libera por tipo e domínio, aborta o resto"""
+    
+    DEFAULT_TYPES = ('document', 'xhr', 'fetch', 'script')
+    DEFAULT_DOMAINS = ('megaleiloes.com.br',)
+    
+    def __init__(self, allowed_types=DEFAULT_TYPES, allowed_domains=DEFAULT_DOMAINS, stats: Optional[Dict] = None):
+        self.allowed_types = set(allowed_types)
+        self.allowed_domains = tuple(d.lower().lstrip('.') for d in allowed_domains)
+        self.stats = stats if stats is not None else {}
+        for key in ('requests_allowed', 'requests_blocked', 'bytes_allowed'):
+            self.stats.setdefault(key, 0)
+    
+    def allows(self, resource_type: str, url: str) -> bool:
+        """Tipo na lista E host no domínio permitido (ou subdomínio dele)"""
+        if resource_type not in self.allowed_types:
+            return False
+        
+        host = (urlsplit(url).hostname or '').lower()
+        return any(host == d or host.endswith(f".{d}") for d in self.allowed_domains)
+    
+    async def handle(self, route):
+        """Handler para context.route('**/*', ...)"""
+        request = route.request
+        if self.allows(request.resource_type, request.url):
+            self.stats['requests_allowed'] += 1
+            await route.continue_()
+        else:
+            self.stats['requests_blocked'] += 1
+            await route.abort()
+    
+    async def on_request_finished(self, request):
+        """Soma os bytes efetivamente baixados pelos requests liberados"""
+        try:
+            sizes = await request.sizes()
+            self.stats['bytes_allowed'] += sizes.get('responseBodySize', 0) + sizes.get('responseHeadersSize', 0)
+        except Exception:
+            pass
+
+
+class ListingResponse(NamedTuple):
+    """Resultado de uma navegação: status, HTML (None se não serve), Retry-After (s), extração no DOM ou JSON capturado"""
+    status: Optional[int]
+    html: Optional[str]
+    retry_after: Optional[float] = None
+    extracted: Optional[Dict] = None
+    captured: Optional[Dict] = None
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Converte o header Retry-After (segundos ou data HTTP) em segundos de espera"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except Exception:
+        return None
+
+
+class _RateLimiterSlot:
+    """Permissão de uma navegação; quem navega registra o status recebido"""
+    
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+    
+    def record(self, status: Optional[int], retry_after: Optional[float] = None):
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdaptiveRateLimiter:
+    """Controle AIMD por host: concorrência e taxa sobem aos poucos e caem pela metade sob pressão"""
+    
+    def __init__(self, host: str, max_concurrency: int, max_rate: float = 10.0, min_rate: float = 0.5,
+                 rate_step: float = 0.1, latency_target: float = 10.0, window: int = 20,
+                 error_threshold: float = 0.5, cooldown: float = 30.0, stats: Optional[Dict] = None):
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.rate_step = rate_step
+        self.latency_target = latency_target
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.stats = stats if stats is not None else {}
+        for key in ('throttled_responses', 'retry_after_waits', 'circuit_breaker_trips'):
+            self.stats.setdefault(key, 0)
+        
+        # Começa no meio do caminho e deixa o AIMD achar o ponto de equilíbrio
+        self.limit = float(max(1, max_concurrency // 2))
+        self.rate = max(min_rate, max_rate / 4)
+        self.in_flight = 0
+        self.latency_ewma: Optional[float] = None
+        
+        self._cond = asyncio.Condition()
+        self._next_start = 0.0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._outcomes = deque(maxlen=window)
+        self._trips = 0
+    
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """Espera vaga de concorrência, o intervalo da taxa e o breaker; mede a navegação"""
+        await self._acquire()
+        slot = _RateLimiterSlot()
+        started = time.monotonic()
+        try:
+            yield slot
+        except Exception:
+            self._on_result(time.monotonic() - started, None, None, failed=True)
+            raise
+        else:
+            self._on_result(time.monotonic() - started, slot.status, slot.retry_after, failed=False)
+        finally:
+            async with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+    
+    async def _acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+            start_at = max(time.monotonic(), self._next_start, self._blocked_until)
+            self._next_start = start_at + 1 / self.rate
+        
+        # Retry-After / breaker podem ter empurrado o bloqueio enquanto esperávamos
+        while True:
+            delay = max(start_at, self._blocked_until) - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+    
+    def _on_result(self, latency: float, status: Optional[int], retry_after: Optional[float], failed: bool):
+        now = time.monotonic()
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        
+        throttled = failed or status == 429 or (status is not None and status >= 500)
+        if throttled:
+            self.stats['throttled_responses'] += 1
+        
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+            self.stats['retry_after_waits'] += 1
+        
+        if throttled or latency > self.latency_target:
+            self._decrease(now)
+        else:
+            # Additive increase: +1 de concorrência a cada ~limit sucessos
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self.rate = min(self.max_rate, self.rate + self.rate_step)
+        
+        self._outcomes.append(throttled)
+        if len(self._outcomes) == self._outcomes.maxlen:
+            error_rate = sum(self._outcomes) / len(self._outcomes)
+            if error_rate >= self.error_threshold:
+                self._trip(now, error_rate)
+    
+    def _decrease(self, now: float):
+        """Multiplicative decrease - no máximo uma vez por latência média (rajadas contam uma vez)"""
+        if now - self._last_decrease < (self.latency_ewma or 0):
+            return
+        self._last_decrease = now
+        self.limit = max(1.0, self.limit / 2)
+        self.rate = max(self.min_rate, self.rate / 2)
+    
+    def _trip(self, now: float, error_rate: float):
+        """Abre o circuito: pausa o host e volta em meia-abertura (1 por vez, metade da taxa)"""
+        self._trips += 1
+        pause = min(self.cooldown * 2 ** (self._trips - 1), 300.0)
+        self._blocked_until = max(self._blocked_until, now + pause)
+        self._outcomes.clear()
+        self.limit = 1.0
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.stats['circuit_breaker_trips'] += 1
+        print(f"  🔌 Circuit breaker aberto para {self.host}: {error_rate:.0%} de erros, pausa de {pause:.0f}s")
+
+
+class BrowserPool:
+    """Um Chromium compartilhado com pool de N abas - lançado só quando alguém precisa dele"""
+    
+    def __init__(self, size: int, readiness: ListingReadiness, resource_policy: Optional[ResourcePolicy] = None,
+                 extract_in_browser: bool = False, capture_json: bool = False,
+                 capture_url_pattern: Optional[re.Pattern] = None):
+        self.size = size
+        self.readiness = readiness
+        self.resource_policy = resource_policy
+        self.extract_in_browser = extract_in_browser
+        self.capture_json = capture_json
+        self.capture_url_pattern = capture_url_pattern
+        self._playwright = None
+        self._browser = None
+        self._tabs: Optional[asyncio.Queue] = None
+        self._launch_lock = asyncio.Lock()
+    
+    @property
+    def launched(self) -> bool:
+        return self._browser is not None
+    
+    async def _ensure_launched(self):
+        """Lança o browser e abre as abas do pool na primeira chamada"""
+        async with self._launch_lock:
+            if self._tabs is not None:
+                return
+            
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True, args=['--no-sandbox'])
+            context = await self._browser.new_context(
+                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+                viewport={'width': 1920, 'height': 1080},
+                locale='pt-BR'
+            )
+            
+            if self.resource_policy is not None:
+                await context.route('**/*', self.resource_policy.handle)
+                context.on('requestfinished', self.resource_policy.on_request_finished)
+            
+            # Pool de abas: cada navegação pega uma aba livre e devolve ao final
+            tabs = asyncio.Queue()
+            for _ in range(self.size):
+                tabs.put_nowait(await context.new_page())
+            self._tabs = tabs
+            print(f"🌐 Chromium iniciado com {self.size} abas")
+    
+    async def load(self, url: str, expect_pagination: bool = False) -> ListingResponse:
+        """Carrega uma página de listagem numa aba livre do pool"""
+        await self._ensure_launched()
+        page = await self._tabs.get()
+        
+        # Respostas desta navegação: o payload JSON de listagem, se existir, dispensa o parse do DOM
+        responses = []
+        
+        def on_response(response):
+            responses.append(response)
+        
+        try:
+            if self.capture_json:
+                page.on('response', on_response)
+            response = await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+            status = response.status if response else None
+            if status is not None and (status == 429 or status >= 500):
+                return ListingResponse(status, None, _parse_retry_after(await response.header_value('retry-after')))
+            
+            await self.readiness.after_goto(page, expect_pagination=expect_pagination)
+            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            await self.readiness.after_scroll(page)
+            
+            if responses:
+                captured = await capture_listing_payload(responses, self.capture_url_pattern)
+                # Só substitui o DOM se o payload traz um registro por card da página (senão é outra lista)
+                if captured is not None and len(captured['records']) != await page.eval_on_selector_all(
+                        'div.card', 'cards => cards.length'):
+                    captured = None
+                if captured is not None:
+                    if not captured['last_page']:
+                        captured['pagination'] = await page.evaluate(PAGINATION_EXTRACT_JS)
+                    return ListingResponse(status, None, captured=captured)
+            
+            if self.extract_in_browser:
+                return ListingResponse(status, None, extracted=await extract_listing_in_browser(page))
+            return ListingResponse(status, await page.content())
+        finally:
+            try:
+                if self.capture_json:
+                    page.remove_listener('response', on_response)
+            finally:
+                self._tabs.put_nowait(page)
+    
+    async def close(self):
+        """Fecha browser e Playwright, se chegaram a ser lançados"""
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+
+class HttpListingFetcher:
+    """Busca listagens direto por HTTP/2 (keep-alive, gzip/brotli), sem Chromium"""
+    
+    CARD_PATTERN = re.compile(r'<div[^>]*\bclass="(?:[^"]*\s)?card(?:\s[^"]*)?"')
+    
+    def __init__(self, max_connections: int):
+        headers = {
+            'User-Agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'pt-BR,pt;q=0.9',
+            # br só é anunciado se o httpx consegue decodificar (pacote brotli/brotlicffi instalado)
+            'Accept-Encoding': 'gzip, deflate, br' if any(
+                importlib.util.find_spec(module) is not None for module in ('brotli', 'brotlicffi')
+            ) else 'gzip, deflate',
+        }
+        self.client = httpx.AsyncClient(
+            http2=importlib.util.find_spec('h2') is not None,
+            headers=headers,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            follow_redirects=True,
+        )
+    
+    async def fetch(self, url: str) -> ListingResponse:
+        """HTML só vem preenchido se a resposta já traz os cards renderizados"""
+        response = await self.client.get(url)
+        retry_after = _parse_retry_after(response.headers.get('retry-after'))
+        if response.status_code != 200:
+            return ListingResponse(response.status_code, None, retry_after)
+        
+        html = response.text
+        if not self.CARD_PATTERN.search(html):
+            return ListingResponse(response.status_code, None, retry_after)
+        
+        return ListingResponse(response.status_code, html, retry_after)
+    
+    async def close(self):
+        await self.client.aclose()
+
+
+class CrawlCheckpoint:
+    """Checkpoint NDJSON append-only das unidades (seção, página) já concluídas e seus itens"""
+    
+    def __init__(self, path: str, resume: bool = False, max_age_hours: Optional[float] = None):
+        self.path = path
+        self.run_id: Optional[str] = None
+        self.created_at: Optional[datetime] = None
+        self.max_pages: Dict[str, int] = {}
+        self.pages: Dict[tuple, List[Dict]] = {}
+        # Unidades concluídas (retomadas + desta run): só com todas presentes o checkpoint pode ser apagado
+        self.done: set = set()
+        
+        if resume and os.path.exists(path):
+            self._load()
+            if max_age_hours is not None and not self._fresh(max_age_hours):
+                # Checkpoint de uma run antiga (runs agendadas já passaram por cima): reaproveitá-lo gravaria valores
+                # velhos na base com o run_id antigo - começa do zero
+                print(f"⚠️ Checkpoint de {self.created_at or 'data desconhecida'} mais velho que {max_age_hours:g}h - ignorado")
+                resume = False
+                self.run_id = self.created_at = None
+                self.max_pages, self.pages = {}, {}
+            self.done.update(self.pages)
+        
+        # Sem --resume começa do zero; com --resume continua anexando ao mesmo arquivo
+        self._fh = open(path, 'a' if resume else 'w', encoding='utf-8')
+    
+    def _load(self):
+        self.run_id, self.created_at = self.read(self.path, self.max_pages, self.pages)
+        print(f"♻️ Checkpoint: {len(self.pages)} páginas concluídas em {len(self.max_pages)} seções")
+    
+    @staticmethod
+    def read(path: str, max_pages: Dict[str, int], pages: Dict[tuple, List[Dict]]) -> tuple:
+        """Lê um checkpoint (ou saída de shard) e devolve (run_id, criado em) - uma última linha truncada é ignorada"""
+        run_id = created_at = None
+        with open(path, encoding='utf-8') as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                
+                if record.get('type') == 'section':
+                    max_pages[record['section']] = record['max_page']
+                elif record.get('type') == 'page':
+                    pages[(record['section'], record['page'])] = record['items']
+                elif record.get('type') == 'run':
+                    run_id = record['run_id']
+                    created_at = datetime.fromisoformat(record['created_at']) if record.get('created_at') else None
+        return run_id, created_at
+    
+    def _fresh(self, max_age_hours: float) -> bool:
+        return self.created_at is not None \
+            and datetime.now(timezone.utc) - self.created_at <= timedelta(hours=max_age_hours)
+    
+    def max_page(self, section: str) -> Optional[int]:
+        return self.max_pages.get(section)
+    
+    def is_done(self, section: str, page: int) -> bool:
+        return (section, page) in self.pages
+    
+    def items(self, section: str, page: int) -> List[Dict]:
+        return self.pages[(section, page)]
+    
+    def record_run(self, run_id: str):
+        self.run_id = run_id
+        self.created_at = datetime.now(timezone.utc)
+        self._append({'type': 'run', 'run_id': run_id, 'created_at': self.created_at.isoformat()})
+    
+    def record_section(self, section: str, max_page: int):
+        self.max_pages[section] = max_page
+        self._append({'type': 'section', 'section': section, 'max_page': max_page})
+    
+    def record_page(self, section: str, page: int, items: List[Dict]):
+        self.done.add((section, page))
+        self._append({'type': 'page', 'section': section, 'page': page, 'items': items})
+    
+    def missing_units(self, sections: List[str]) -> List[tuple]:
+        """Unidades (seção, página) ainda não concluídas - seção sem total de páginas conhecido entra como (seção, None)"""
+        missing = []
+        for section in sections:
+            max_page = self.max_pages.get(section)
+            if max_page is None:
+                missing.append((section, None))
+                continue
+            missing.extend((section, page) for page in range(1, max_page + 1) if (section, page) not in self.done)
+        return missing
+    
+    def _append(self, record: Dict):
+        # flush por linha: um kill do processo não perde o que já foi concluído
+        self._fh.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._fh.flush()
+    
+    def close(self):
+        if not self._fh.closed:
+            self._fh.close()
+    
+    def clear(self):
+        """Run concluída: o checkpoint não serve mais"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class StateCache:
+    """Cache local (SQLite) dos itens da base e do último snapshot por item, sincronizado por watermark"""
+    
+    VERSION = '2'
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS items (id TEXT PRIMARY KEY, data TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS snapshots (item_id TEXT PRIMARY KEY, data TEXT NOT NULL);
+        """)
+    
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def watermark(self, name: str) -> Optional[datetime]:
+        try:
+            return datetime.fromisoformat(self.get_meta(f'watermark_{name}'))
+        except (TypeError, ValueError):
+            return None
+    
+    def invalid_reason(self, max_age_hours: float) -> Optional[str]:
+        """Motivo para recarga completa, ou None se o cache pode ser sincronizado incrementalmente"""
+        if self.get_meta('version') != self.VERSION:
+            return "cache vazio ou de outra versão"
+        if self.watermark('items') is None or self.watermark('snapshots') is None:
+            return "watermark ausente ou inválido"
+        
+        # Remoções na base não aparecem no sync incremental: de tempos em tempos recarrega tudo
+        full_sync_at = datetime.fromisoformat(self.get_meta('full_sync_at'))
+        if datetime.now(timezone.utc) - full_sync_at > timedelta(hours=max_age_hours):
+            return f"última recarga completa há mais de {max_age_hours:g}h"
+        return None
+    
+    def load(self) -> tuple:
+        items = [json.loads(data) for (data,) in self.conn.execute("SELECT data FROM items")]
+        snapshots = [json.loads(data) for (data,) in self.conn.execute("SELECT data FROM snapshots")]
+        return items, snapshots
+    
+    def save(self, items: List[Dict], snapshots: List[Dict], watermarks: Dict[str, Optional[datetime]],
+             full: bool = False):
+        """Grava itens/snapshots (substituindo tudo se full) e os watermarks, numa transação"""
+        with self.conn:
+            if full:
+                self.conn.execute("DELETE FROM items")
+                self.conn.execute("DELETE FROM snapshots")
+                self.conn.execute("DELETE FROM meta")
+                self.conn.execute("INSERT INTO meta VALUES ('version', ?), ('full_sync_at', ?)",
+                                  (self.VERSION, datetime.now(timezone.utc).isoformat()))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO items VALUES (?, ?)",
+                ((json.dumps(item['id']), json.dumps(item, ensure_ascii=False)) for item in items),
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?)",
+                ((json.dumps(snap['item_id']), json.dumps(snap, ensure_ascii=False)) for snap in snapshots),
+            )
+            for name, value in watermarks.items():
+                if value is not None:
+                    self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (f'watermark_{name}', value.isoformat()))
+    
+    def close(self):
+        self.conn.close()
+
+
+def parse_shard_spec(spec: str) -> tuple:
+    """'i/N' -> (i, N), com 0 <= i < N"""
+    match = re.fullmatch(r'(\d+)/(\d+)', spec.strip())
+    if not match or not 0 <= int(match.group(1)) < int(match.group(2)):
+        raise argparse.ArgumentTypeError(f"shard inválido: {spec} (use i/N com 0 <= i < N)")
+    return int(match.group(1)), int(match.group(2))
+
+
+def shard_for_page(section: str, page: int, max_page: int, shard_count: int) -> int:
+    """Shard dono da página: a seção é dividida em shard_count faixas contíguas de tamanho quase igual (±1 página);
+    a faixa j vai para o shard (j + deslocamento estável da seção) % shard_count. Cada shard fica com no máximo
+    uma página a mais que a parte justa por seção, independente de quantas seções/blocos existam"""
+    band = (page - 1) * shard_count // max(max_page, 1)
+    return (band + zlib.crc32(section.encode())) % shard_count
+
+
+def merge_shard_outputs(paths: List[str]) -> tuple:
+    """Junta as saídas dos shards: itens deduplicados por link e páginas que nenhum shard entregou"""
+    max_pages: Dict[str, int] = {}
+    pages: Dict[tuple, List[Dict]] = {}
+    for path in paths:
+        CrawlCheckpoint.read(path, max_pages, pages)
+    
+    missing = [(section, page) for section, max_page in max_pages.items()
+               for page in range(1, max_page + 1) if (section, page) not in pages]
+    return dedupe_page_items(pages), len(pages), missing
+
+
+def dedupe_page_items(pages: Dict[tuple, List[Dict]]) -> List[Dict]:
+    """Itens das páginas em ordem (seção, página), um por link"""
+    items_by_link: Dict[str, Dict] = {}
+    for key in sorted(pages):
+        for item in pages[key]:
+            items_by_link.setdefault(item['link'], item)
+    return list(items_by_link.values())
+
+
+class CrawlFrontier(abc.ABC):
+    """Fronteira do crawl distribuído: unidades (seção, página) de uma run, reivindicadas com lease por workers"""
+    
+    def __init__(self, run_id: str, lease_seconds: int = 120, max_attempts: int = 3):
+        self.run_id = run_id
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+    
+    @abc.abstractmethod
+    def seed(self, section: str, first: int, last: int):
+        """Insere as páginas [first, last] da seção (idempotente)"""
+    
+    @abc.abstractmethod
+    def claim(self, worker: str, limit: int) -> List[tuple]:
+        """Até `limit` unidades livres ou com lease vencido, sem bloquear outros workers"""
+    
+    @abc.abstractmethod
+    def heartbeat(self, worker: str, units: List[tuple]) -> int:
+        """Renova o lease das unidades ainda do worker; devolve quantas renovou"""
+    
+    @abc.abstractmethod
+    def complete(self, worker: str, section: str, page: int, items: List[Dict]) -> bool:
+        """Grava os itens da página; False se ela já tinha sido concluída por outro worker"""
+    
+    @abc.abstractmethod
+    def fail(self, worker: str, section: str, page: int, error: str):
+        """Devolve a unidade à fila, ou a marca como falha após max_attempts tentativas"""
+    
+    @abc.abstractmethod
+    def open_count(self) -> int:
+        """Unidades que ainda podem ser (ou estão sendo) processadas"""
+    
+    @abc.abstractmethod
+    def results(self) -> tuple:
+        """(páginas concluídas {(seção, página): itens}, unidades não concluídas)"""
+
+
+class SupabaseFrontier(CrawlFrontier):
+    """Fronteira em Postgres (auctions.megaleiloes_frontier) via RPCs com FOR UPDATE SKIP LOCKED"""
+    
+    def __init__(self, supabase: Client, run_id: str, lease_seconds: int = 120, max_attempts: int = 3):
+        super().__init__(run_id, lease_seconds, max_attempts)
+        self.db = supabase.schema('auctions')
+    
+    def _rpc(self, name: str, params: Dict):
+        return self.db.rpc(f'megaleiloes_frontier_{name}', {'p_run_id': self.run_id, **params}).execute().data
+    
+    def seed(self, section: str, first: int, last: int):
+        self._rpc('seed', {'p_section': section, 'p_first': first, 'p_last': last})
+    
+    def claim(self, worker: str, limit: int) -> List[tuple]:
+        rows = self._rpc('claim', {'p_worker': worker, 'p_limit': limit, 'p_lease_seconds': self.lease_seconds,
+                                   'p_max_attempts': self.max_attempts})
+        return [(row['section'], row['page']) for row in rows or []]
+    
+    def heartbeat(self, worker: str, units: List[tuple]) -> int:
+        return self._rpc('heartbeat', {'p_worker': worker, 'p_lease_seconds': self.lease_seconds,
+                                       'p_units': [{'section': s, 'page': p} for s, p in units]})
+    
+    def complete(self, worker: str, section: str, page: int, items: List[Dict]) -> bool:
+        return bool(self._rpc('complete', {'p_worker': worker, 'p_section': section, 'p_page': page, 'p_items': items}))
+    
+    def fail(self, worker: str, section: str, page: int, error: str):
+        self._rpc('fail', {'p_worker': worker, 'p_section': section, 'p_page': page, 'p_error': error[:500],
+                           'p_max_attempts': self.max_attempts})
+    
+    def open_count(self) -> int:
+        return int(self._rpc('open_count', {'p_max_attempts': self.max_attempts}) or 0)
+    
+    def results(self) -> tuple:
+        pages: Dict[tuple, List[Dict]] = {}
+        failed = []
+        offset = 0
+        while True:
+            rows = self.db.table('megaleiloes_frontier') \
+                .select('section,page,status,items') \
+                .eq('run_id', self.run_id) \
+                .order('section').order('page') \
+                .range(offset, offset + 999) \
+                .execute().data or []
+            for row in rows:
+                if row['status'] == 'done':
+                    pages[(row['section'], row['page'])] = row['items'] or []
+                else:
+                    failed.append((row['section'], row['page']))
+            if len(rows) < 1000:
+                return pages, failed
+            offset += 1000
+
+
+class SqliteFrontier(CrawlFrontier):
+    """Fronteira em SQLite para runs locais - vários processos na mesma máquina; BEGIN IMMEDIATE faz o papel do SKIP LOCKED"""
+    
+    def __init__(self, path: str, run_id: str, lease_seconds: int = 120, max_attempts: int = 3):
+        super().__init__(run_id, lease_seconds, max_attempts)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS megaleiloes_frontier (
+                run_id TEXT NOT NULL, section TEXT NOT NULL, page INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending', lease_owner TEXT, lease_expires_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0, items TEXT, last_error TEXT,
+                PRIMARY KEY (run_id, section, page)
+            )
+        """)
+    
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+    
+    def seed(self, section: str, first: int, last: int):
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO megaleiloes_frontier (run_id, section, page) VALUES (?, ?, ?)",
+                [(self.run_id, section, page) for page in range(first, last + 1)],
+            )
+    
+    def claim(self, worker: str, limit: int) -> List[tuple]:
+        now = time.time()
+        with self._transaction() as conn:
+            units = conn.execute(
+                "SELECT section, page FROM megaleiloes_frontier "
+                "WHERE run_id = ? AND attempts < ? "
+                "AND (status = 'pending' OR (status = 'leased' AND lease_expires_at < ?)) "
+                "ORDER BY page, section LIMIT ?",
+                (self.run_id, self.max_attempts, now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE megaleiloes_frontier SET status = 'leased', lease_owner = ?, lease_expires_at = ?, "
+                "attempts = attempts + 1 WHERE run_id = ? AND section = ? AND page = ?",
+                [(worker, now + self.lease_seconds, self.run_id, section, page) for section, page in units],
+            )
+        return [tuple(unit) for unit in units]
+    
+    def heartbeat(self, worker: str, units: List[tuple]) -> int:
+        expires = time.time() + self.lease_seconds
+        with self._transaction() as conn:
+            return sum(conn.execute(
+                "UPDATE megaleiloes_frontier SET lease_expires_at = ? "
+                "WHERE run_id = ? AND section = ? AND page = ? AND status = 'leased' AND lease_owner = ?",
+                (expires, self.run_id, section, page, worker),
+            ).rowcount for section, page in units)
+    
+    def complete(self, worker: str, section: str, page: int, items: List[Dict]) -> bool:
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE megaleiloes_frontier SET status = 'done', items = ?, lease_owner = ?, lease_expires_at = NULL "
+                "WHERE run_id = ? AND section = ? AND page = ? AND status <> 'done'",
+                (json.dumps(items, ensure_ascii=False), worker, self.run_id, section, page),
+            ).rowcount > 0
+    
+    def fail(self, worker: str, section: str, page: int, error: str):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE megaleiloes_frontier SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "lease_owner = NULL, lease_expires_at = NULL, last_error = ? "
+                "WHERE run_id = ? AND section = ? AND page = ? AND status = 'leased' AND lease_owner = ?",
+                (self.max_attempts, error[:500], self.run_id, section, page, worker),
+            )
+    
+    def open_count(self) -> int:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM megaleiloes_frontier WHERE run_id = ? AND ("
+                "(status = 'pending' AND attempts < ?) OR "
+                "(status = 'leased' AND (lease_expires_at >= ? OR attempts < ?)))",
+                (self.run_id, self.max_attempts, time.time(), self.max_attempts),
+            ).fetchone()[0]
+    
+    def results(self) -> tuple:
+        pages: Dict[tuple, List[Dict]] = {}
+        failed = []
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT section, page, status, items FROM megaleiloes_frontier WHERE run_id = ?",
+                (self.run_id,),
+            ).fetchall()
+        for section, page, status, items in rows:
+            if status == 'done':
+                pages[(section, page)] = json.loads(items) if items else []
+            else:
+                failed.append((section, page))
+        return pages, failed
+
+
+def same_db_value(old, new) -> bool:
+    """Valor da base x valor scrapado: números com 2 casas, timestamps pelo instante (fusos diferentes)"""
+    if old is None or new is None:
+        return old is None and new is None
+    if isinstance(new, bool) or isinstance(old, bool):
+        return bool(old) == bool(new)
+    if isinstance(new, (int, float)):
+        try:
+            return round(float(old), 2) == round(float(new), 2)
+        except (TypeError, ValueError):
+            return False
+    if isinstance(new, str) and isinstance(old, str) and old != new:
+        try:
+            return datetime.fromisoformat(old) == datetime.fromisoformat(new)
+        except ValueError:
+            return False
+    return old == new
+
+
+class SnapshotPolicy:
+    """Decide se um snapshot vai para a base: primeiro do item, mudança num campo monitorado ou heartbeat vencido"""
+    
+    # Campo monitorado -> coluna do snapshot
+    FIELDS = {
+        'value': 'current_value',
+        'has_bid': 'has_bid',
+        'auction_round': 'auction_round',
+        'auction_date': 'auction_date',
+        'is_active': 'is_active',
+    }
+    
+    def __init__(self, mode: str = 'changes', fields=tuple(FIELDS), heartbeat_hours: float = 24.0):
+        if mode not in ('changes', 'all'):
+            raise ValueError(f"❌ Política de snapshot inválida: {mode} (use changes/all)")
+        unknown = set(fields) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"❌ Campos de snapshot desconhecidos: {', '.join(sorted(unknown))}")
+        self.mode = mode
+        self.fields = list(fields)
+        self.columns = [self.FIELDS[field] for field in fields]
+        self.heartbeat_hours = heartbeat_hours
+        self.heartbeat = timedelta(hours=heartbeat_hours)
+    
+    def decide(self, snapshot: Dict, last_snap: Optional[Dict]) -> Optional[str]:
+        """Motivo da gravação ('all', 'first', 'change', 'heartbeat') ou None se o snapshot é suprimido"""
+        if self.mode == 'all':
+            return 'all'
+        if last_snap is None:
+            return 'first'
+        if any(not same_db_value(last_snap.get(column), snapshot.get(column)) for column in self.columns):
+            return 'change'
+        
+        try:
+            elapsed = datetime.fromisoformat(snapshot['snapshot_at']) - datetime.fromisoformat(last_snap['snapshot_at'])
+        except (KeyError, TypeError, ValueError):
+            return 'heartbeat'
+        return 'heartbeat' if elapsed >= self.heartbeat else None
+
+
+class WriteJournal:
+    """Journal local (segmentos NDJSON) das escritas pendentes: lote gravado antes do envio, ack depois"""
+    
+    def __init__(self, directory: str, segment_bytes: int = 8 * 1024 * 1024, fsync: bool = True):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        
+        # Lotes ainda sem ack por segmento, em ordem de criação: um segmento só é apagado quando não tem
+        # pendências e todos os anteriores já foram apagados (senão um ack dele para um lote antigo se perderia)
+        self.pending: Dict[int, Dict] = {}
+        self._segment_pending: Dict[str, int] = {}
+        self._next_id = 1
+        self._fh = None
+        self._segment_path: Optional[str] = None
+        self._load()
+        
+        segments = self._segments()
+        self._segment_seq = int(segments[-1][len('segment-'):-len('.ndjson')]) + 1 if segments else 1
+        self._open_segment()
+    
+    def _segments(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.startswith('segment-') and name.endswith('.ndjson'))
+    
+    def _load(self):
+        """Lotes sem ack dos segmentos existentes - uma última linha truncada é ignorada"""
+        for name in self._segments():
+            path = os.path.join(self.directory, name)
+            with open(path, encoding='utf-8') as fh:
+                for line in fh:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._next_id = max(self._next_id, record['id'] + 1)
+                    if record['type'] == 'batch':
+                        self.pending[record['id']] = {**record, 'segment': path}
+                    elif record['type'] == 'ack':
+                        self.pending.pop(record['id'], None)
+        
+        for name in self._segments():
+            self._segment_pending[os.path.join(self.directory, name)] = 0
+        for entry in self.pending.values():
+            self._segment_pending[entry['segment']] += 1
+        self._drop_settled_segments()
+    
+    def _open_segment(self):
+        self._segment_path = os.path.join(self.directory, f"segment-{self._segment_seq:06d}.ndjson")
+        self._segment_seq += 1
+        self._segment_pending.setdefault(self._segment_path, 0)
+        self._fh = open(self._segment_path, 'a', encoding='utf-8')
+    
+    def _append(self, record: Dict):
+        self._fh.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        self._fh.flush()
+        if self.fsync:
+            os.fsync(self._fh.fileno())
+    
+    def append(self, kind: str, rows: List, meta: Optional[Dict] = None) -> int:
+        """Grava o lote (e o contexto do envio: run_id, horário do scrape) antes do envio; devolve o id para o ack"""
+        with self._lock:
+            if self._fh.tell() >= self.segment_bytes:
+                self._rotate()
+            entry_id = self._next_id
+            self._next_id += 1
+            record = {'type': 'batch', 'id': entry_id, 'kind': kind, 'rows': rows}
+            if meta:
+                record['meta'] = meta
+            self._append(record)
+            self.pending[entry_id] = {**record, 'segment': self._segment_path}
+            self._segment_pending[self._segment_path] += 1
+            return entry_id
+    
+    def ack(self, entry_id: int, leftover: Optional[List] = None):
+        """Lote enviado; o que sobrou por erro transitório volta ao journal como lote novo"""
+        if leftover:
+            self.append(self.pending[entry_id]['kind'], leftover, self.pending[entry_id].get('meta'))
+        
+        with self._lock:
+            entry = self.pending.pop(entry_id, None)
+            if entry is None:
+                return
+            self._append({'type': 'ack', 'id': entry_id})
+            self._segment_pending[entry['segment']] -= 1
+            self._drop_settled_segments()
+    
+    def _rotate(self):
+        self._fh.close()
+        self._open_segment()
+        self._drop_settled_segments()
+    
+    def _drop_settled_segments(self, include_current: bool = False):
+        """Apaga, a partir do mais antigo, os segmentos sem pendências - para no primeiro com lote pendente"""
+        for path in list(self._segment_pending):
+            if self._segment_pending[path] or (path == self._segment_path and not include_current):
+                return
+            del self._segment_pending[path]
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def pending_rows(self) -> int:
+        with self._lock:
+            return sum(len(entry['rows']) for entry in self.pending.values())
+    
+    def replay(self, writers: Dict[str, Callable[..., Optional[List]]]) -> int:
+        """Reenvia os lotes pendentes em ordem (escritas idempotentes, com o contexto original); devolve quantos foram reenviados"""
+        with self._lock:
+            entries = sorted(self.pending.values(), key=lambda entry: entry['id'])
+        replayed = 0
+        for entry in entries:
+            print(f"📒 Reenviando lote {entry['id']} do journal: {len(entry['rows'])} {entry['kind']}")
+            try:
+                leftover = writers[entry['kind']](entry['rows'], **entry.get('meta', {}))
+            except Exception as e:
+                # Lote continua pendente no journal para a próxima run
+                print(f"⚠️ Lote {entry['id']} do journal falhou no reenvio, mantido pendente: {e}")
+                continue
+            self.ack(entry['id'], leftover)
+            replayed += 1
+        return replayed
+    
+    def close(self):
+        with self._lock:
+            if self._fh is not None and not self._fh.closed:
+                self._fh.close()
+                self._drop_settled_segments(include_current=True)
+
+
+class BackgroundWriter:
+    """Thread de escrita: executa os lotes do WriteBuffer em paralelo ao scrape, com fila limitada (backpressure)"""
+    
+    def __init__(self, max_pending: int = 4, stats: Optional[Dict] = None, stats_lock: Optional[threading.Lock] = None):
+        self.max_pending = max_pending
+        self.stats = stats if stats is not None else {}
+        self.stats_lock = stats_lock or threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+    
+    def _start(self):
+        if self._thread is None:
+            self._queue = queue.Queue(maxsize=self.max_pending)
+            self._thread = threading.Thread(target=self._run, name='mega-writer', daemon=True)
+            self._thread.start()
+    
+    def submit(self, job: Callable[[], None]):
+        """Enfileira um lote; com a fila cheia (base atrás do scrape) bloqueia quem produz - só fora do event loop"""
+        self._start()
+        started = time.perf_counter()
+        self._queue.put(job)
+        self._record_backpressure(started)
+    
+    async def submit_async(self, job: Callable[[], None]):
+        """Enfileira a partir do event loop: com a fila cheia a espera vai para uma thread e as páginas em voo seguem"""
+        self._start()
+        try:
+            self._queue.put_nowait(job)
+            return
+        except queue.Full:
+            pass
+        started = time.perf_counter()
+        await asyncio.to_thread(self._queue.put, job)
+        self._record_backpressure(started)
+    
+    def _record_backpressure(self, started: float):
+        with self.stats_lock:
+            self.stats['write_backpressure_seconds'] = self.stats.get('write_backpressure_seconds', 0.0) \
+                + time.perf_counter() - started
+    
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                job()
+            except Exception as e:
+                print(f"❌ Erro na thread de escrita: {e}")
+                with self.stats_lock:
+                    self.stats['errors'] = self.stats.get('errors', 0) + 1
+    
+    def drain(self):
+        """Espera a fila esvaziar e encerra a thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+class WriteBuffer:
+    """Buffer de escrita limitado: despeja snapshots, updates e toques (ids sem mudança) assim que cada lote enche"""
+    
+    def __init__(self, write_snapshots, write_updates, write_touches, batch_size: int = 500, touch_batch_size: int = 5000,
+                 writer: Optional[BackgroundWriter] = None, journal: Optional[WriteJournal] = None,
+                 write_records=None, record_batch_size: int = 2000, snapshot_batch_size: Optional[int] = None,
+                 record_meta: Optional[Callable[[], Dict]] = None):
+        # Cada escrita devolve as linhas que ficaram pendentes (erro transitório) - voltam ao journal
+        self.writers = {'snapshots': write_snapshots, 'updates': write_updates, 'touches': write_touches,
+                        'records': write_records}
+        self.batch_size = batch_size
+        self.snapshot_batch_size = snapshot_batch_size or batch_size
+        self.touch_batch_size = touch_batch_size
+        self.record_batch_size = record_batch_size
+        # Contexto gravado com cada lote de registros (run_id, horário do scrape) e repassado no envio e no replay
+        self.record_meta = record_meta
+        self.records: List[Dict] = []
+        self.writer = writer
+        self.journal = journal
+        self.snapshots: List[Dict] = []
+        self.updates: List[Dict] = []
+        self.touches: List = []
+        # Dentro do event loop os lotes prontos esperam submit_pending() em vez de bloquear no submit()
+        self._ready: Optional[deque] = None
+        self._submit_lock: Optional[asyncio.Lock] = None
+    
+    def add_snapshot(self, snapshot: Dict):
+        self.snapshots.append(snapshot)
+        if len(self.snapshots) >= self.snapshot_batch_size:
+            self.flush_snapshots()
+    
+    def add_update(self, update: Dict):
+        self.updates.append(update)
+        if len(self.updates) >= self.batch_size:
+            self.flush_updates()
+    
+    def add_touch(self, item_id):
+        self.touches.append(item_id)
+        if len(self.touches) >= self.touch_batch_size:
+            self.flush_touches()
+    
+    def add_record(self, record: Dict):
+        """Registro scrapado cru (modo servidor: match, diff e escrita ficam no Postgres)"""
+        self.records.append(record)
+        if len(self.records) >= self.record_batch_size:
+            self.flush_records()
+    
+    def flush_records(self):
+        if self.records:
+            batch, self.records = self.records, []
+            print(f"\n🛰️ Aplicando {len(batch)} registros no servidor...")
+            self._write('records', batch, self.record_meta() if self.record_meta else None)
+    
+    def flush_snapshots(self):
+        if self.snapshots:
+            batch, self.snapshots = self.snapshots, []
+            print(f"\n💾 Inserindo {len(batch)} snapshots...")
+            self._write('snapshots', batch)
+    
+    def flush_updates(self):
+        if self.updates:
+            batch, self.updates = self.updates, []
+            print(f"\n🔄 Atualizando {len(batch)} itens na tabela base...")
+            self._write('updates', batch)
+    
+    def flush_touches(self):
+        if self.touches:
+            batch, self.touches = self.touches, []
+            self._write('touches', batch)
+    
+    def _write(self, kind: str, batch: List, meta: Optional[Dict] = None):
+        write = self.writers[kind]
+        entry_id = self.journal.append(kind, batch, meta) if self.journal is not None else None
+        
+        def job():
+            leftover = write(batch, **(meta or {}))
+            if entry_id is not None:
+                self.journal.ack(entry_id, leftover)
+        
+        if self.writer is None:
+            job()
+        elif self._ready is not None:
+            self._ready.append(job)
+        else:
+            self.writer.submit(job)
+    
+    def defer_submits(self):
+        """Produtor passa a ser o event loop: lotes prontos só vão ao writer via submit_pending()"""
+        if self.writer is not None:
+            self._ready = deque()
+            self._submit_lock = asyncio.Lock()
+    
+    async def submit_pending(self):
+        """Entrega os lotes prontos ao writer, em ordem, sem bloquear o event loop quando a fila está cheia"""
+        if self._ready is None:
+            return
+        async with self._submit_lock:
+            while self._ready:
+                await self.writer.submit_async(self._ready.popleft())
+    
+    async def stop_deferring(self):
+        await self.submit_pending()
+        self._ready = None
+        self._submit_lock = None
+    
+    def flush(self):
+        """Despeja o que sobrou e espera a escrita terminar (fim da run)"""
+        self.flush_records()
+        self.flush_snapshots()
+        self.flush_updates()
+        self.flush_touches()
+        if self.writer is not None:
+            while self._ready:
+                self.writer.submit(self._ready.popleft())
+            self.writer.drain()
+
+
 class MegaLeiloesMonitor:
     """Monitor para MegaLeilões - scrape completo e match com base"""
     
@@ -60,22 +2234,181 @@ class MegaLeiloesMonitor:
             'items_scraped': 0,
             'items_matched': 0,
             'items_new': 0,
+            'duplicate_links': 0,
             'snapshots_created': 0,
+            'snapshots_all': 0,
+            'snapshots_first': 0,
+            'snapshots_change': 0,
+            'snapshots_heartbeat': 0,
+            'snapshots_suppressed': 0,
             'items_updated': 0,
             'bid_changes': 0,
             'value_changes': 0,
             'status_changes': 0,
             'pages_scraped': 0,
+            'pages_resumed': 0,
+            'parse_seconds': 0.0,
+            'pages_http': 0,
+            'pages_browser': 0,
+            'http_fallbacks': 0,
+            'pages_dom_extracted': 0,
+            'pages_json_captured': 0,
+            'throttled_responses': 0,
+            'retry_after_waits': 0,
+            'circuit_breaker_trips': 0,
+            'write_seconds': 0.0,
+            'write_backpressure_seconds': 0.0,
+            'write_chunks': 0,
+            'write_chunk_max_seconds': 0.0,
+            'snapshots_inserted': 0,
+            'items_touched': 0,
             'errors': 0,
         }
         
+        # Campos do CARD_FIELDS cujo seletor não achou nada (por campo)
+        self.selector_misses: Dict[str, int] = {}
+        
         # Cache da base de dados (link -> dados do item)
         self.db_items_by_link = {}
         self.db_items_by_id = {}
         self.last_snapshots = {}
+        
+        # Links já casados na run e páginas que terminaram antes das anteriores, por seção (ver _release_page)
+        self._seen_links = set()
+        self._held_pages: Dict[str, Dict[int, List[Dict]]] = {}
+        self._next_page: Dict[str, int] = {}
+        
+        # Concorrência do scrape: total de abas no pool e limite por seção
+        self.max_concurrency = max(1, int(os.getenv('MEGA_CONCURRENCY', '4')))
+        self.section_concurrency = max(1, int(os.getenv('MEGA_SECTION_CONCURRENCY', '2')))
+        
+        # Fetch: 'http' busca o HTML direto (Chromium só como fallback), 'browser' usa sempre o Chromium
+        self.fetch_mode = os.getenv('MEGA_FETCH_MODE', 'http')
+        if self.fetch_mode not in ('http', 'browser'):
+            raise ValueError(f"❌ MEGA_FETCH_MODE inválido: {self.fetch_mode} (use http/browser)")
+        if self.fetch_mode == 'http' and httpx is None:
+            print("⚠️ httpx não instalado - usando apenas o Chromium")
+            self.fetch_mode = 'browser'
+        
+        # Política de recursos do Chromium: só documento, XHR e scripts do próprio site
+        self.resource_policy = None
+        if os.getenv('MEGA_BLOCK_RESOURCES', '1') == '1':
+            self.resource_policy = ResourcePolicy(
+                allowed_types=_env_list('MEGA_ALLOW_TYPES', ResourcePolicy.DEFAULT_TYPES),
+                allowed_domains=_env_list('MEGA_ALLOW_DOMAINS', ResourcePolicy.DEFAULT_DOMAINS),
+                stats=self.stats,
+            )
+        
+        # Tentativas por página (429/5xx/timeouts) - o ritmo fica com o AdaptiveRateLimiter
+        self.max_retries = max(1, int(os.getenv('MEGA_MAX_RETRIES', '3')))
+        
+        # Workers de parse (processos); 0 = parse inline no loop (padrão). O pool spawn reimporta playwright/supabase
+        # por worker e com selectolax sai mais lento que o inline: só vale ligar com ganho medido no `bench-parse`
+        self.parser_workers = max(0, int(os.getenv('MEGA_PARSER_WORKERS', '0')))
+        
+        # Backend de parse: o mais rápido instalado (paridade conferida com `bench-parse`)
+        default_backend = next(spec for spec in ('selectolax', 'lxml+strainer', 'html.parser+strainer')
+                               if parser_backend_available(spec))
+        self.parser_backend = os.getenv('MEGA_PARSER_BACKEND', default_backend)
+        if not parser_backend_available(self.parser_backend):
+            print(f"⚠️ Backend {self.parser_backend} indisponível - usando html.parser")
+            self.parser_backend = 'html.parser'
+        get_parser_backend(self.parser_backend)
+        
+        # Páginas via Chromium: 'dom' extrai os cards no próprio browser ($$eval), 'html' serializa e parseia
+        self.extract_mode = os.getenv('MEGA_EXTRACT_MODE', 'dom')
+        if self.extract_mode not in ('dom', 'html'):
+            raise ValueError(f"❌ MEGA_EXTRACT_MODE inválido: {self.extract_mode} (use dom/html)")
+        
+        # Captura de payloads JSON de listagem (XHR/fetch) nas páginas carregadas pelo Chromium: opt-in,
+        # restrita ao endpoint de listagem quando MEGA_CAPTURE_URL_PATTERN (regex) estiver definido
+        self.capture_json = os.getenv('MEGA_CAPTURE_JSON', '0') == '1'
+        capture_url_pattern = os.getenv('MEGA_CAPTURE_URL_PATTERN')
+        self.capture_url_pattern = re.compile(capture_url_pattern) if capture_url_pattern else None
+        
+        # Identidade da run nos snapshots: MEGA_RUN_ID, janela do cron (MEGA_RUN_ID_WINDOW_H) ou id da run do GitHub
+        self.run_id = os.getenv('MEGA_RUN_ID') or self._default_run_id()
+        
+        # Escrita em chunks: paralelismo, retries de erro transitório e chunks de snapshot adaptativos (linhas/bytes/latência)
+        self._stats_lock = threading.Lock()
+        self.write_concurrency = max(1, int(os.getenv('MEGA_WRITE_CONCURRENCY', '4')))
+        self.write_retries = max(0, int(os.getenv('MEGA_WRITE_RETRIES', '3')))
+        self.write_latency_target = float(os.getenv('MEGA_WRITE_LATENCY_TARGET_S', '2'))
+        self.snapshot_chunk_min_rows = 10
+        self.snapshot_chunk_max_rows = max(self.snapshot_chunk_min_rows, int(os.getenv('MEGA_SNAPSHOT_CHUNK_MAX', '1000')))
+        self.snapshot_chunk_bytes = int(os.getenv('MEGA_SNAPSHOT_CHUNK_BYTES', str(512 * 1024)))
+        self._snapshot_chunk_rows = 200
+        
+        # Política de snapshot: 'changes' grava só mudanças (campos de MEGA_SNAPSHOT_FIELDS) + heartbeat; 'all' grava tudo
+        self.snapshot_policy = SnapshotPolicy(
+            mode=os.getenv('MEGA_SNAPSHOT_POLICY', 'changes'),
+            fields=_env_list('MEGA_SNAPSHOT_FIELDS', tuple(SnapshotPolicy.FIELDS)),
+            heartbeat_hours=float(os.getenv('MEGA_SNAPSHOT_HEARTBEAT_H', '24')),
+        )
+        
+        # Pipeline de escrita: lotes limitados, despejados assim que enchem numa thread própria (fila de MEGA_WRITE_QUEUE lotes).
+        # O lote de snapshots comporta MEGA_WRITE_CONCURRENCY chunks no tamanho máximo: o paralelismo não fica preso ao lote
+        self.write_buffer = WriteBuffer(
+            self._insert_snapshots_batch,
+            self._update_base_items_batch,
+            self._touch_items_batch,
+            batch_size=max(1, int(os.getenv('MEGA_WRITE_BATCH', '500'))),
+            snapshot_batch_size=max(1, int(os.getenv('MEGA_SNAPSHOT_BATCH')
+                                           or self.write_concurrency * self.snapshot_chunk_max_rows)),
+            writer=BackgroundWriter(max(1, int(os.getenv('MEGA_WRITE_QUEUE', '4'))), stats=self.stats,
+                                    stats_lock=self._stats_lock)
+            if os.getenv('MEGA_BACKGROUND_WRITES', '1') == '1' else None,
+            write_records=self._apply_scraped_batch,
+            record_batch_size=max(1, int(os.getenv('MEGA_APPLY_BATCH', '2000'))),
+            record_meta=lambda: {'run_id': self.run_id, 'scraped_at': datetime.now(timezone.utc).isoformat()},
+        )
+        
+        # Estágio de escrita: 'client' casa e compara aqui; 'server' envia os registros para megaleiloes_apply_scraped
+        self.write_mode = os.getenv('MEGA_WRITE_MODE', 'client')
+        if self.write_mode not in ('client', 'server'):
+            raise ValueError(f"❌ MEGA_WRITE_MODE inválido: {self.write_mode} (use client/server)")
+        
+        # Journal das escritas pendentes (vazio desliga): aberto pela run, reenviado no início da próxima
+        self.journal_dir = os.getenv('MEGA_JOURNAL_DIR', 'megaleiloes_journal')
+        
+        # Checkpoint do crawl (seção, página) para retomar runs interrompidas com --resume
+        self.checkpoint_path = os.getenv('MEGA_CHECKPOINT_PATH', 'megaleiloes_checkpoint.ndjson')
+        self.checkpoint: Optional[CrawlCheckpoint] = None
+        # --resume só reaproveita checkpoint dentro da janela da run (depois disso outra run já atualizou a base)
+        self.checkpoint_max_age_hours = float(os.getenv('MEGA_CHECKPOINT_MAX_AGE_H')
+                                              or os.getenv('MEGA_RUN_ID_WINDOW_H') or '24')
+        
+        # Cache local do estado da base (vazio desliga): sync incremental por updated_at/snapshot_at
+        self.state_cache_path = os.getenv('MEGA_STATE_CACHE', 'megaleiloes_state.sqlite')
+        self.state_max_age_hours = float(os.getenv('MEGA_STATE_MAX_AGE_H', '168'))
+        self.state_overlap_seconds = int(os.getenv('MEGA_STATE_OVERLAP_S', '600'))
+        
+        # Sharding estático (--shard i/N): uma faixa contígua de cada seção por shard, saída NDJSON consolidada pelo `merge`
+        self.shard: Optional[tuple] = None
+        
+        # Readiness: 'events' espera sinais da página, 'sleep' usa as pausas fixas antigas
+        self.readiness = ListingReadiness(
+            mode=os.getenv('MEGA_READINESS', 'events'),
+            timeout_ms=int(os.getenv('MEGA_READY_TIMEOUT_MS', '15000')),
+            idle_timeout_ms=int(os.getenv('MEGA_IDLE_TIMEOUT_MS', '3000')),
+            stats=self.stats,
+        )
     
-    def run(self):
-        """Executa monitoramento completo"""
+    @staticmethod
+    def _default_run_id() -> str:
+        """Janela de N horas (runs sobrepostas na mesma janela compartilham o id), run do GitHub ou run local"""
+        now = datetime.now(timezone.utc)
+        window_hours = float(os.getenv('MEGA_RUN_ID_WINDOW_H', '0'))
+        if window_hours > 0:
+            window = timedelta(hours=window_hours)
+            start = datetime.fromtimestamp(now.timestamp() // window.total_seconds() * window.total_seconds(), timezone.utc)
+            return f"window-{start:%Y%m%dT%H%MZ}"
+        if os.getenv('GITHUB_RUN_ID'):
+            return f"gh-{os.getenv('GITHUB_RUN_ID')}"
+        return f"local-{now:%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:6]}"
+    
+    def run(self, resume: bool = False, full_sync: bool = False):
+        """Executa monitoramento completo (resume=True retoma do checkpoint da run anterior)"""
         print("\n" + "="*70)
         print("🔍 MEGALEILÕES - MONITORAMENTO")
         print("="*70)
@@ -84,381 +2417,775 @@ class MegaLeiloesMonitor:
         
         start_time = time.time()
         
-        # 1. Carrega dados da base em memória
+        self.checkpoint = CrawlCheckpoint(self.checkpoint_path, resume=resume, max_age_hours=self.checkpoint_max_age_hours)
+        
+        # Run retomada continua com o run_id original: páginas refeitas não duplicam snapshots
+        if self.checkpoint.run_id:
+            self.run_id = self.checkpoint.run_id
+        else:
+            self.checkpoint.record_run(self.run_id)
+        print(f"🏷️ run_id: {self.run_id}")
+        
+        # 0. Escritas que a run anterior não conseguiu entregar (antes do estado: updates mudam a base)
+        self._open_journal()
+        
+        # 1 e 2. Itens da base e últimos snapshots em memória (cache local + sync incremental)
+        self._load_state(full_sync)
+        
+        # 3 e 4. Scrape em streaming: cada página é casada, comparada e enviada ao buffer de escrita
+        print("\n🌐 Iniciando scrape completo (match e escrita em streaming)...")
+        self._scrape_all_sections()
+        self.write_buffer.flush()
+        self._close_journal()
+        print(f"✅ {self.stats['items_scraped']} itens scrapados")
+        
+        # Run completa: o próximo --resume não deve reaproveitar estas páginas. Com unidades faltando
+        # (seção ou página que falhou) o checkpoint fica para o --resume refazer só o que faltou
+        missing = self.checkpoint.missing_units([url_path for url_path, _ in self.sections])
+        if missing:
+            self.checkpoint.close()
+            print(f"⚠️ Checkpoint mantido: {len(missing)} unidades (seção, página) não concluídas - "
+                  f"use --resume para completá-las")
+        else:
+            self.checkpoint.clear()
+        
+        # 5. Estatísticas finais
+        elapsed = time.time() - start_time
+        self._print_stats(elapsed)
+    
+    def run_shard(self, shard: tuple, resume: bool = False):
+        """Só o scrape das páginas do shard; os itens ficam no arquivo do shard para o `merge`"""
+        index, count = shard
+        self.shard = shard
+        output_path = os.getenv('MEGA_SHARD_OUTPUT', f"megaleiloes_shard_{index}of{count}.ndjson")
+        
+        print("\n" + "="*70)
+        print(f"🔍 MEGALEILÕES - SHARD {index}/{count}")
+        print("="*70)
+        print(f"📅 Início: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print("="*70)
+        
+        start_time = time.time()
+        
+        # A saída do shard é um checkpoint: --resume continua de onde o shard parou
+        self.checkpoint = CrawlCheckpoint(output_path, resume=resume)
+        
+        print(f"\n🌐 Scrape do shard {index}/{count} (faixas contíguas de cada seção)...")
+        self._scrape_all_sections()
+        self.checkpoint.close()
+        print(f"✅ {self.stats['items_scraped']} itens gravados em {output_path}")
+        
+        self._print_stats(time.time() - start_time)
+    
+    def run_merge(self, paths: List[str] = (), run_id: Optional[str] = None, full_sync: bool = False):
+        """Consolida as saídas dos shards (ou da fronteira da run) e roda match/snapshot/update uma única vez"""
+        print("\n" + "="*70)
+        print("🔍 MEGALEILÕES - MERGE " + (f"DA FRONTEIRA {run_id}" if run_id else "DE SHARDS"))
+        print("="*70)
+        
+        start_time = time.time()
+        
+        if run_id:
+            self.run_id = os.getenv('MEGA_RUN_ID') or f"frontier-{run_id}"
+            frontier = self._create_frontier(run_id)
+            pages, missing = frontier.results()
+            items, page_count = dedupe_page_items(pages), len(pages)
+            still_open = frontier.open_count()
+            print(f"📦 Fronteira {run_id} | {page_count} páginas | {len(items)} itens únicos")
+            if still_open:
+                print(f"⚠️ {still_open} unidades ainda em aberto - a run não terminou")
+            if missing:
+                print(f"⚠️ {len(missing)} páginas não concluídas: "
+                      f"{', '.join(f'{section}:{page}' for section, page in missing[:20])}")
+        else:
+            items, page_count, missing = merge_shard_outputs(paths)
+            print(f"📦 {len(paths)} arquivos | {page_count} páginas | {len(items)} itens únicos")
+            if missing:
+                print(f"⚠️ {len(missing)} páginas sem nenhum shard: "
+                      f"{', '.join(f'{section}:{page}' for section, page in missing[:20])}")
+        self.stats['pages_scraped'] = page_count
+        
+        self._open_journal()
+        self._load_state(full_sync)
+        
+        self.stats['items_scraped'] = len(items)
+        self._process_matches_and_snapshots(items)
+        self._close_journal()
+        
+        self._print_stats(time.time() - start_time)
+    
+    def replay_journal(self):
+        """Só reenvia as escritas pendentes do journal (sem scrape)"""
+        print("\n" + "="*70)
+        print(f"🔍 MEGALEILÕES - REPLAY DO JOURNAL ({self.journal_dir})")
+        print("="*70)
+        
+        start_time = time.time()
+        if not self.journal_dir:
+            print("⚠️ MEGA_JOURNAL_DIR vazio - journal desligado")
+            return
+        self._open_journal()
+        self._close_journal()
+        self._print_stats(time.time() - start_time)
+    
+    def _open_journal(self):
+        """Abre o journal da run e reenvia os lotes que ficaram sem ack"""
+        if not self.journal_dir:
+            return
+        
+        journal = WriteJournal(self.journal_dir, fsync=os.getenv('MEGA_JOURNAL_FSYNC', '1') == '1')
+        if journal.pending:
+            print(f"\n📒 Journal: {len(journal.pending)} lotes ({journal.pending_rows()} linhas) pendentes da run anterior")
+            journal.replay(self.write_buffer.writers)
+        self.write_buffer.journal = journal
+    
+    def _close_journal(self):
+        journal = self.write_buffer.journal
+        if journal is not None:
+            pending = journal.pending_rows()
+            journal.close()
+            self.write_buffer.journal = None
+            if pending:
+                print(f"📒 {pending} linhas seguem no journal {self.journal_dir}")
+    
+    def _create_frontier(self, run_id: str) -> CrawlFrontier:
+        """MEGA_FRONTIER: 'supabase' (padrão) ou 'sqlite:<arquivo>' para runs locais"""
+        spec = os.getenv('MEGA_FRONTIER', 'supabase')
+        lease_seconds = max(10, int(os.getenv('MEGA_LEASE_SECONDS', '120')))
+        max_attempts = max(1, int(os.getenv('MEGA_FRONTIER_MAX_ATTEMPTS', '3')))
+        if spec.startswith('sqlite:'):
+            return SqliteFrontier(spec[len('sqlite:'):], run_id, lease_seconds, max_attempts)
+        if spec != 'supabase':
+            raise ValueError(f"❌ MEGA_FRONTIER inválido: {spec} (use supabase ou sqlite:<arquivo>)")
+        return SupabaseFrontier(self.supabase, run_id, lease_seconds, max_attempts)
+    
+    def run_worker(self, run_id: str):
+        """Worker elástico: reivindica unidades da fronteira até a run esvaziar; o match fica para o `merge`"""
+        worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        frontier = self._create_frontier(run_id)
+        
+        print("\n" + "="*70)
+        print(f"🔍 MEGALEILÕES - WORKER {worker} (run {run_id})")
+        print("="*70)
+        print(f"📅 Início: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print("="*70)
+        
+        start_time = time.time()
+        try:
+            asyncio.run(self._work_frontier_async(frontier, worker))
+        except Exception as e:
+            print(f"❌ Erro no worker: {e}")
+            import traceback
+            traceback.print_exc()
+        
+        self._print_stats(time.time() - start_time)
+    
+    async def _work_frontier_async(self, frontier: CrawlFrontier, worker: str):
+        """Mantém até N unidades em voo; sem nada livre, espera leases vencerem até a fronteira esvaziar"""
+        # Página 1 de cada seção é a semente: ao concluí-la, o worker insere as demais páginas
+        for url_path, display_name in self.sections:
+            await asyncio.to_thread(frontier.seed, url_path, 1, 1)
+        
+        poll_seconds = min(5.0, frontier.lease_seconds / 4)
+        in_flight: Dict[tuple, asyncio.Task] = {}
+        
+        async with self._crawl_session():
+            heartbeat = asyncio.create_task(self._frontier_heartbeat(frontier, worker, in_flight))
+            try:
+                while True:
+                    units = []
+                    if len(in_flight) < self.max_concurrency:
+                        units = await asyncio.to_thread(frontier.claim, worker, self.max_concurrency - len(in_flight))
+                        for unit in units:
+                            in_flight[unit] = asyncio.create_task(self._work_frontier_unit(frontier, worker, *unit))
+                    
+                    if not in_flight:
+                        if await asyncio.to_thread(frontier.open_count) == 0:
+                            break
+                        # Unidades de outros workers em lease: uma delas pode vencer (worker morto)
+                        await asyncio.sleep(poll_seconds)
+                        continue
+                    
+                    await asyncio.wait(in_flight.values(), timeout=poll_seconds, return_when=asyncio.FIRST_COMPLETED)
+                    for unit, task in list(in_flight.items()):
+                        if task.done():
+                            del in_flight[unit]
+            finally:
+                heartbeat.cancel()
+        
+        print(f"✅ Fronteira esvaziada - {self.stats['pages_scraped']} páginas feitas por este worker")
+    
+    async def _frontier_heartbeat(self, frontier: CrawlFrontier, worker: str, in_flight: Dict[tuple, asyncio.Task]):
+        """Renova os leases das unidades em voo a cada terço do lease"""
+        while True:
+            await asyncio.sleep(frontier.lease_seconds / 3)
+            if not in_flight:
+                continue
+            try:
+                await asyncio.to_thread(frontier.heartbeat, worker, list(in_flight))
+            except Exception as e:
+                print(f"  ⚠️ Heartbeat falhou: {e}")
+    
+    async def _work_frontier_unit(self, frontier: CrawlFrontier, worker: str, url_path: str, page_num: int):
+        """Uma unidade (seção, página): carrega, parseia e devolve os itens para a fronteira"""
+        display_name = dict(self.sections).get(url_path, url_path)
+        url = f"{self.base_url}/{url_path}" + (f"?pagina={page_num}" if page_num > 1 else '')
+        
+        try:
+            response = await self._load_listing(url, expect_pagination=page_num == 1)
+            if page_num > 1:
+                await self.readiness.page_pause()
+            parsed = await self._parse_response(response)
+            del response
+            
+            page_items = self._report_parsed_page(parsed, display_name, page_num, parsed.max_page if page_num == 1 else '?')
+            if page_num == 1:
+                print(f"📄 [{display_name}] Total de páginas detectadas: {parsed.max_page}")
+                if parsed.max_page > 1:
+                    await asyncio.to_thread(frontier.seed, url_path, 2, parsed.max_page)
+            
+            await asyncio.to_thread(frontier.complete, worker, url_path, page_num, page_items)
+            self.stats['items_scraped'] += len(page_items)
+        
+        except Exception as e:
+            print(f"  ❌ [{display_name}] Erro na página {page_num}: {e}")
+            with self._stats_lock:
+                self.stats['errors'] += 1
+            try:
+                await asyncio.to_thread(frontier.fail, worker, url_path, page_num, str(e))
+            except Exception as fail_error:
+                # Sem registrar a falha o lease vence e a unidade volta para a fila do mesmo jeito
+                print(f"  ⚠️ Falha não registrada na fronteira: {fail_error}")
+    
+    def _owns_page(self, url_path: str, page_num: int, max_page: int) -> bool:
+        """Sem shard, todas as páginas; com shard, só as da faixa atribuída (faixas dimensionadas pelo total de páginas)"""
+        if self.shard is None:
+            return True
+        index, count = self.shard
+        return shard_for_page(url_path, page_num, max_page, count) == index
+    
+    # Colunas da tabela base lidas pelo match, snapshot e diff do update (+ updated_at, watermark do cache local)
+    DB_ITEM_COLUMNS = ('id,external_id,link,value,has_bid,auction_round,auction_date,first_round_value,'
+                       'first_round_date,discount_percentage,is_active,category,city,state,auction_type,updated_at')
+    
+    def _load_state(self, full_sync: bool = False):
+        """Itens e últimos snapshots: do cache local + sync incremental, ou recarga completa da base"""
+        if self.write_mode == 'server':
+            print("\n🛰️ Modo servidor: match e diff no Postgres - nada a carregar no cliente")
+            return
+        
+        if not self.state_cache_path:
+            self._load_state_from_database()
+            return
+        
+        cache = StateCache(self.state_cache_path)
+        try:
+            reason = "--full-sync" if full_sync else cache.invalid_reason(self.state_max_age_hours)
+            if reason:
+                print(f"\n🗄️ Cache local {self.state_cache_path}: recarga completa ({reason})")
+                # Tabela vazia não tem maior timestamp: o início da recarga vira o watermark (a folga cobre atrasos)
+                sync_started = datetime.now(timezone.utc)
+                self._load_state_from_database()
+                cache.save(list(self.db_items_by_id.values()), list(self.last_snapshots.values()), {
+                    'items': self._max_timestamp(self.db_items_by_id.values(), 'updated_at') or sync_started,
+                    'snapshots': self._max_timestamp(self.last_snapshots.values(), 'snapshot_at') or sync_started,
+                }, full=True)
+                return
+            
+            started = time.perf_counter()
+            items, snapshots = cache.load()
+            for item in items:
+                self._index_db_item(item)
+            for snap in snapshots:
+                self.last_snapshots[snap['item_id']] = snap
+            print(f"\n🗄️ Cache local: {len(items)} itens e {len(snapshots)} snapshots "
+                  f"em {time.perf_counter() - started:.1f}s")
+            
+            # Só o que mudou desde o último sync (com folga para commits atrasados)
+            overlap = timedelta(seconds=self.state_overlap_seconds)
+            changed_items = self._scan_since('megaleiloes_items', self.DB_ITEM_COLUMNS, 'updated_at', 'id',
+                                             cache.watermark('items') - overlap)
+            for item in changed_items:
+                self._index_db_item(item)
+            
+            new_snapshots = self._scan_since('megaleiloes_monitoring', '*', 'snapshot_at', 'item_id',
+                                             cache.watermark('snapshots') - overlap)
+            latest = {}
+            for snap in new_snapshots:
+                current = self.last_snapshots.get(snap['item_id'])
+                if current is None or datetime.fromisoformat(snap['snapshot_at']) >= datetime.fromisoformat(current['snapshot_at']):
+                    self.last_snapshots[snap['item_id']] = latest[snap['item_id']] = snap
+            
+            cache.save(changed_items, list(latest.values()), {
+                'items': self._max_timestamp(changed_items, 'updated_at') or cache.watermark('items'),
+                'snapshots': self._max_timestamp(new_snapshots, 'snapshot_at') or cache.watermark('snapshots'),
+            })
+            print(f"🔄 Sync incremental: {len(changed_items)} itens e {len(new_snapshots)} snapshots novos "
+                  f"({time.perf_counter() - started:.1f}s no total)")
+        finally:
+            cache.close()
+        
+        print(f"✅ {len(self.db_items_by_link)} itens e {len(self.last_snapshots)} snapshots em memória")
+    
+    def _load_state_from_database(self):
         print("\n📊 Carregando itens da base de dados...")
         self._load_database_items()
         print(f"✅ {len(self.db_items_by_link)} itens carregados da base")
         
-        # 2. Carrega últimos snapshots
         print("\n📸 Carregando últimos snapshots...")
         self._load_last_snapshots()
         print(f"✅ {len(self.last_snapshots)} snapshots anteriores carregados")
+    
+    @staticmethod
+    def _max_timestamp(rows, column: str) -> Optional[datetime]:
+        values = [datetime.fromisoformat(row[column]) for row in rows if row.get(column)]
+        return max(values) if values else None
+    
+    def _scan_since(self, table: str, columns: str, time_column: str, key_column: str, since: datetime) -> List[Dict]:
+        """Linhas com time_column > since - keyset em (time_column, key_column), sem OFFSET nem teto de max-rows"""
+        page_size = max(1, int(os.getenv('MEGA_DB_PAGE_SIZE', '1000')))
+        rows: List[Dict] = []
         
-        # 3. Scrape de todas as páginas
-        print("\n🌐 Iniciando scrape completo...")
-        scraped_data = self._scrape_all_sections()
-        print(f"✅ {len(scraped_data)} itens scrapados")
-        
-        # 4. Processa matches e gera snapshots
-        print("\n🔄 Processando matches e mudanças...")
-        self._process_matches_and_snapshots(scraped_data)
+        while True:
+            query = self.supabase.schema('auctions').table(table) \
+                .select(columns) \
+                .gt(time_column, since.isoformat())
+            if table == 'megaleiloes_items':
+                query = query.eq('source', self.source)
+            if rows:
+                last_time, last_key = rows[-1][time_column], rows[-1][key_column]
+                query = query.or_(f'{time_column}.gt."{last_time}",'
+                                  f'and({time_column}.eq."{last_time}",{key_column}.gt."{last_key}")')
+            
+            page = query.order(time_column).order(key_column).limit(page_size).execute().data
+            if not page:
+                return rows
+            rows.extend(page)
+    
+    def _index_db_item(self, item: Dict):
+        # Item já conhecido (sync incremental): o link antigo deixa de apontar para ele
+        previous = self.db_items_by_id.get(item['id'])
+        if previous is not None:
+            old_link = (previous.get('link') or '').split('?')[0].rstrip('/')
+            if self.db_items_by_link.get(old_link) is previous:
+                del self.db_items_by_link[old_link]
         
-        # 5. Estatísticas finais
-        elapsed = time.time() - start_time
-        self._print_stats(elapsed)
+        # Normaliza o link (remove params UTM e trailing slash)
+        link = (item.get('link') or '').split('?')[0].rstrip('/')
+        self.db_items_by_link[link] = item
+        self.db_items_by_id[item['id']] = item
     
     def _load_database_items(self):
-        """Carrega todos os itens ativos da base em memória"""
+        """Carrega os itens da base em memória - keyset por id (sem o teto de max-rows), faixas de id em paralelo"""
+        started = time.perf_counter()
         try:
-            response = self.supabase.schema('auctions').table('megaleiloes_items') \
-                .select('*') \
-                .eq('source', 'megaleiloes') \
-                .execute()
-            
-            if response.data:
-                for item in response.data:
-                    # Normaliza o link (remove params UTM e trailing slash)
-                    link = item.get('link', '').split('?')[0].rstrip('/')
-                    self.db_items_by_link[link] = item
-                    self.db_items_by_id[item['id']] = item
-            
+            ranges = self._db_id_ranges(max(1, int(os.getenv('MEGA_DB_READ_STREAMS', '4'))))
+            with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+                pages = sum(pool.map(lambda bounds: self._load_id_range(*bounds), ranges))
+        
         except Exception as e:
             print(f"❌ Erro ao carregar itens da base: {e}")
             raise
+        
+        print(f"⏱️ {pages} páginas em {len(ranges)} faixas de id: {time.perf_counter() - started:.1f}s")
+    
+    def _db_id_ranges(self, streams: int) -> List[tuple]:
+        """Divide o espaço de ids em faixas [início, fim) - ids inteiros pelo min/max, UUIDs pelo espaço de 128 bits"""
+        if streams == 1:
+            return [(None, None)]
+        
+        table = self.supabase.schema('auctions').table('megaleiloes_items')
+        first = table.select('id').eq('source', self.source).order('id').limit(1).execute().data
+        last = table.select('id').eq('source', self.source).order('id', desc=True).limit(1).execute().data
+        if not first:
+            return [(None, None)]
+        low, high = first[0]['id'], last[0]['id']
+        
+        if isinstance(low, int) and isinstance(high, int):
+            step = max(1, -(-(high - low + 1) // streams))
+            bounds = list(range(low + step, high + 1, step))
+        else:
+            try:
+                uuid.UUID(str(low))
+            except ValueError:
+                return [(None, None)]
+            bounds = [str(uuid.UUID(int=(1 << 128) * k // streams)) for k in range(1, streams)]
+        
+        edges = [None] + bounds + [None]
+        return list(zip(edges[:-1], edges[1:]))
+    
+    def _load_id_range(self, start, end) -> int:
+        """Keyset sobre uma faixa de ids; só para na página vazia (uma página curta pode ser o teto do servidor)"""
+        page_size = max(1, int(os.getenv('MEGA_DB_PAGE_SIZE', '1000')))
+        last_id = None
+        pages = 0
+        
+        while True:
+            query = self.supabase.schema('auctions').table('megaleiloes_items') \
+                .select(self.DB_ITEM_COLUMNS) \
+                .eq('source', self.source)
+            if start is not None:
+                query = query.gte('id', start)
+            if end is not None:
+                query = query.lt('id', end)
+            if last_id is not None:
+                query = query.gt('id', last_id)
+            
+            rows = query.order('id').limit(page_size).execute().data
+            if not rows:
+                return pages
+            
+            for item in rows:
+                self._index_db_item(item)
+            
+            last_id = rows[-1]['id']
+            pages += 1
     
     def _load_last_snapshots(self):
-        """Carrega último snapshot de cada item"""
+        """Carrega último snapshot de cada item - RPC com uma busca indexada por item, ids no corpo do POST"""
         try:
             if not self.db_items_by_id:
                 return
             
             item_ids = list(self.db_items_by_id.keys())
+            batches = [item_ids[i:i+1000] for i in range(0, len(item_ids), 1000)]
             
-            # Busca em lotes de 1000
-            for i in range(0, len(item_ids), 1000):
-                batch = item_ids[i:i+1000]
-                
-                response = self.supabase.schema('auctions').table('megaleiloes_monitoring') \
-                    .select('*') \
-                    .in_('item_id', batch) \
-                    .order('snapshot_at', desc=True) \
-                    .execute()
-                
-                if response.data:
-                    # Pega apenas o mais recente de cada item
-                    seen = set()
-                    for snap in response.data:
-                        item_id = snap['item_id']
-                        if item_id not in seen:
-                            self.last_snapshots[item_id] = snap
-                            seen.add(item_id)
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max(1, int(os.getenv('MEGA_DB_READ_STREAMS', '4')))) as pool:
+                for rows in pool.map(self._fetch_latest_snapshots, batches):
+                    for snap in rows:
+                        self.last_snapshots[snap['item_id']] = snap
+            print(f"⏱️ {len(batches)} lotes de snapshots: {time.perf_counter() - started:.1f}s")
         
         except Exception as e:
             print(f"⚠️ Erro ao carregar snapshots: {e}")
     
-    def _scrape_all_sections(self) -> List[Dict]:
-        """Scrape todas as seções - igual ao scraper original"""
-        all_items = []
-        
+    def _fetch_latest_snapshots(self, batch: List) -> List[Dict]:
+        """Último snapshot de cada id do lote (auctions.megaleiloes_latest_snapshots)"""
+        return self.supabase.schema('auctions') \
+            .rpc('megaleiloes_latest_snapshots', {'p_items': [{'item_id': item_id} for item_id in batch]}) \
+            .execute().data or []
+    
+    def _scrape_all_sections(self):
+        """Scrape todas as seções - páginas concorrentes entre seções"""
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True, args=['--no-sandbox'])
-                
-                context = browser.new_context(
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                    viewport={'width': 1920, 'height': 1080},
-                    locale='pt-BR'
-                )
-                
-                page = context.new_page()
-                
-                for url_path, display_name in self.sections:
-                    print(f"\n{'='*70}")
-                    print(f"📦 {display_name}")
-                    print(f"{'='*70}")
-                    
-                    section_items = self._scrape_section(page, url_path, display_name)
-                    all_items.extend(section_items)
-                    
-                    print(f"✅ {len(section_items)} itens coletados de {display_name}")
-                    time.sleep(2)
-                
-                browser.close()
+            asyncio.run(self._scrape_all_sections_async())
         
         except Exception as e:
             print(f"❌ Erro no scrape: {e}")
             import traceback
             traceback.print_exc()
+    
+    async def _scrape_all_sections_async(self):
+        """Mantém N páginas em voo entre seções; HTTP direto quando possível, Chromium como fallback"""
+        async with self._crawl_session():
+            results = await asyncio.gather(*[
+                self._scrape_section(url_path, display_name)
+                for url_path, display_name in self.sections
+            ])
+        
+        for (url_path, display_name), section_count in zip(self.sections, results):
+            print(f"✅ {section_count} itens coletados de {display_name}")
+    
+    @contextlib.asynccontextmanager
+    async def _crawl_session(self):
+        """Limiters, pool de abas, cliente HTTP e workers de parse de uma run (ou worker da fronteira)"""
+        self._limiters = {}
+        self._browser_pool = BrowserPool(
+            self.max_concurrency, self.readiness, self.resource_policy,
+            extract_in_browser=self.extract_mode == 'dom',
+            capture_json=self.capture_json,
+            capture_url_pattern=self.capture_url_pattern,
+        )
+        self._http_fetcher = HttpListingFetcher(self.max_concurrency) if self.fetch_mode == 'http' else None
+        self._parser_pool = None
+        if self.parser_workers > 0:
+            self._parser_pool = ProcessPoolExecutor(
+                max_workers=self.parser_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        
+        print(f"🗂️ Pool: {self.max_concurrency} páginas | {self.section_concurrency} por seção | "
+              f"fetch: {self.fetch_mode} | readiness: {self.readiness.mode} | parsers: {self.parser_workers or 'inline'}")
+        
+        self.write_buffer.defer_submits()
+        try:
+            yield
+        
+        finally:
+            await self.write_buffer.stop_deferring()
+            if self._http_fetcher is not None:
+                await self._http_fetcher.close()
+            await self._browser_pool.close()
+            if self._parser_pool is not None:
+                self._parser_pool.shutdown()
+        
+        for limiter in self._limiters.values():
+            print(f"🎚️ {limiter.host}: concorrência final {limiter.limit:.1f} | taxa final {limiter.rate:.1f} req/s")
+    
+    def _limiter_for(self, url: str) -> AdaptiveRateLimiter:
+        """Um controlador AIMD por host"""
+        host = urlsplit(url).hostname or ''
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(
+                host,
+                max_concurrency=self.max_concurrency,
+                max_rate=float(os.getenv('MEGA_MAX_RATE', '10')),
+                latency_target=float(os.getenv('MEGA_LATENCY_TARGET_S', '10')),
+                stats=self.stats,
+            )
+            self._limiters[host] = limiter
+        return limiter
+    
+    async def _load_listing(self, url: str, expect_pagination: bool = False) -> ListingResponse:
+        """Carrega uma página de listagem com retry, sob o controle AIMD do host"""
+        limiter = self._limiter_for(url)
+        
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                async with limiter.slot() as slot:
+                    response = await self._fetch_listing(url, expect_pagination)
+                    slot.record(response.status, response.retry_after)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                print(f"  ⚠️ Tentativa {attempt}/{self.max_retries} falhou para {url}: {e}")
+                continue
+            
+            if response.status is not None and (response.status == 429 or response.status >= 500):
+                if attempt == self.max_retries:
+                    raise RuntimeError(f"HTTP {response.status} após {attempt} tentativas")
+                print(f"  ⚠️ HTTP {response.status} em {url} - tentativa {attempt}/{self.max_retries}")
+                continue
+            
+            return response
+    
+    async def _fetch_listing(self, url: str, expect_pagination: bool) -> ListingResponse:
+        """Uma navegação: HTTP primeiro, Chromium se a resposta não tiver cards"""
+        if self._http_fetcher is not None:
+            response = await self._http_fetcher.fetch(url)
+            if response.html is not None:
+                self.stats['pages_http'] += 1
+                return response
+            
+            # Site sob pressão: não insiste pelo Chromium, devolve para o retry
+            if response.status is not None and (response.status == 429 or response.status >= 500):
+                return response
+            
+            self.stats['http_fallbacks'] += 1
         
-        self.stats['items_scraped'] = len(all_items)
-        return all_items
+        response = await self._browser_pool.load(url, expect_pagination=expect_pagination)
+        self.stats['pages_browser'] += 1
+        return response
     
-    def _scrape_section(self, page, url_path: str, display_name: str) -> List[Dict]:
-        """Scrape uma seção - todas as páginas"""
-        items = []
+    async def _scrape_section(self, url_path: str, display_name: str) -> int:
+        """Scrape uma seção - todas as páginas, em paralelo até o limite da seção"""
         url = f"{self.base_url}/{url_path}"
+        section_limit = asyncio.Semaphore(self.section_concurrency)
+        checkpoint = self.checkpoint
         
         try:
-            # Primeira página
-            page.goto(url, wait_until="domcontentloaded", timeout=60000)
-            time.sleep(3)
-            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            time.sleep(2)
-            
-            html = page.content()
-            soup = BeautifulSoup(html, 'html.parser')
-            
-            # Detecta número de páginas
-            max_page = self._get_max_page(soup)
-            print(f"📄 Total de páginas detectadas: {max_page}")
-            
-            # Scrape todas as páginas
-            for page_num in range(1, max_page + 1):
-                if page_num == 1:
-                    current_soup = soup
-                else:
-                    current_url = f"{url}?pagina={page_num}"
-                    page.goto(current_url, wait_until="domcontentloaded", timeout=60000)
-                    time.sleep(3)
-                    page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    time.sleep(2)
-                    current_html = page.content()
-                    current_soup = BeautifulSoup(current_html, 'html.parser')
+            max_page = checkpoint.max_page(url_path) if checkpoint else None
+            
+            if max_page is not None and (checkpoint.is_done(url_path, 1) or not self._owns_page(url_path, 1, max_page)):
+                print(f"📄 [{display_name}] Total de páginas (checkpoint): {max_page}")
+                first_page_count = 0
+                if checkpoint.is_done(url_path, 1):
+                    first_page_count = await self._consume_page(url_path, 1, checkpoint.items(url_path, 1), resumed=True)
+            else:
+                # Primeira página (define o total de páginas)
+                async with section_limit:
+                    response = await self._load_listing(url, expect_pagination=True)
+                parsed = await self._parse_response(response)
+                del response
                 
-                # Extrai cards
-                cards = current_soup.select('div.card')
+                # Detecta número de páginas
+                max_page = parsed.max_page
+                print(f"📄 [{display_name}] Total de páginas detectadas: {max_page}")
                 
-                if not cards:
-                    print(f"  ⚠️ Página {page_num}/{max_page}: Nenhum card encontrado")
-                    continue
+                first_page_items = self._report_parsed_page(parsed, display_name, 1, max_page)
                 
-                print(f"  📄 Página {page_num}/{max_page}: {len(cards)} cards encontrados")
+                if checkpoint:
+                    checkpoint.record_section(url_path, max_page)
+                
+                # Com shard, a primeira página é lida por todos (total de páginas), mas só o dono a entrega
+                first_page_count = 0
+                if self._owns_page(url_path, 1, max_page):
+                    first_page_count = await self._consume_page(url_path, 1, first_page_items)
+            
+            async def scrape_page(page_num: int) -> int:
+                if checkpoint and checkpoint.is_done(url_path, page_num):
+                    return await self._consume_page(url_path, page_num, checkpoint.items(url_path, page_num), resumed=True)
                 
-                page_items = 0
-                for card in cards:
-                    item = self._parse_card(card)
-                    if item:
-                        items.append(item)
-                        page_items += 1
+                try:
+                    async with section_limit:
+                        response = await self._load_listing(f"{url}?pagina={page_num}")
+                        await self.readiness.page_pause()
+                    parsed = await self._parse_response(response)
+                    del response
+                    page_items = self._report_parsed_page(parsed, display_name, page_num, max_page)
+                except Exception as e:
+                    # Página com erro não entra no checkpoint: um --resume tenta de novo
+                    print(f"  ❌ [{display_name}] Erro na página {page_num}/{max_page}: {e}")
+                    if self.shard is None:
+                        await self._release_page(url_path, page_num, [])
+                    return 0
                 
-                self.stats['pages_scraped'] += 1
-                print(f"  ✅ {page_items} itens extraídos da página {page_num}")
-                time.sleep(2)
+                return await self._consume_page(url_path, page_num, page_items)
+            
+            other_pages = await asyncio.gather(*[
+                scrape_page(page_num) for page_num in range(2, max_page + 1)
+                if self._owns_page(url_path, page_num, max_page)
+            ])
         
         except Exception as e:
-            print(f"❌ Erro ao processar seção: {e}")
+            print(f"❌ [{display_name}] Erro ao processar seção: {e}")
             import traceback
             traceback.print_exc()
+            return 0
         
-        return items
-    
-    def _get_max_page(self, soup) -> int:
-        """Detecta número máximo de páginas"""
-        try:
-            last_link = soup.select_one('ul.pagination li.last a')
-            if last_link:
-                href = last_link.get('href', '')
-                match = re.search(r'pagina=(\d+)', href)
-                if match:
-                    return int(match.group(1))
-            
-            page_links = soup.select('ul.pagination li a[data-page]')
-            if page_links:
-                pages = []
-                for link in page_links:
-                    href = link.get('href', '')
-                    match = re.search(r'pagina=(\d+)', href)
-                    if match:
-                        pages.append(int(match.group(1)))
-                if pages:
-                    return max(pages)
-            
-            return 1
-        except Exception:
-            return 1
+        finally:
+            # Seção interrompida: o que ficou esperando uma página anterior ainda é casado, na ordem
+            held = self._held_pages.pop(url_path, {})
+            for page_num in sorted(held):
+                self._process_page_items(held[page_num])
+            await self.write_buffer.submit_pending()
+        
+        return first_page_count + sum(other_pages)
     
-    def _parse_card(self, card) -> Optional[Dict]:
-        """Parse de um card - versão simplificada focada em dados de monitoramento"""
-        try:
-            # 1. Link (obrigatório para match)
-            link_elem = card.select_one('a[href]')
-            if not link_elem:
-                return None
-            
-            link = link_elem.get('href', '')
-            if not link or 'javascript' in link.lower():
-                return None
-            
-            if not link.startswith('http'):
-                link = f"{self.base_url}{link}"
-            
-            link_clean = link.split('?')[0].rstrip('/')
-            
-            # 2. Extrai informações de praça
-            auction_info = self._extract_auction_info_from_html(card)
-            
-            # 3. Has bid
-            has_bid = self._extract_has_bid(card)
-            
-            # 4. Valor
-            value = auction_info.get('current_value')
-            
-            # 5. Is active (se tem data de leilão no futuro ou está "aberto para lances")
-            is_active = True
-            texto = card.get_text(separator=' ', strip=True).lower()
-            if 'encerrado' in texto or 'finalizado' in texto:
-                is_active = False
-            
-            return {
-                'link': link_clean,
-                'value': value,
-                'has_bid': has_bid,
-                'auction_round': auction_info.get('auction_round'),
-                'auction_date': auction_info.get('auction_date'),
-                'first_round_value': auction_info.get('first_round_value'),
-                'first_round_date': auction_info.get('first_round_date'),
-                'discount_percentage': auction_info.get('discount_percentage'),
-                'is_active': is_active,
-            }
+    async def _consume_page(self, url_path: str, page_num: int, page_items: List[Dict], resumed: bool = False) -> int:
+        """Fim da página no pipeline: checkpoint, match, diff e buffer de escrita - nada fica acumulado"""
+        if resumed:
+            self.stats['pages_resumed'] += 1
+        elif self.checkpoint:
+            self.checkpoint.record_page(url_path, page_num, page_items)
         
-        except Exception:
-            return None
+        self.stats['items_scraped'] += len(page_items)
+        
+        # Shard só coleta: match e escrita ficam para o `merge`
+        if self.shard is not None:
+            return len(page_items)
+        await self._release_page(url_path, page_num, page_items)
+        
+        return len(page_items)
     
-    def _extract_has_bid(self, card) -> bool:
-        """Verifica se tem lances"""
-        try:
-            legal_icon = card.select_one('i.fa-legal')
-            if legal_icon:
-                parent_span = legal_icon.find_parent('span')
-                if parent_span:
-                    text = parent_span.get_text(strip=True)
-                    numbers = re.findall(r'\d+', text)
-                    if numbers:
-                        return int(numbers[0]) > 0
-            return False
-        except Exception:
-            return False
+    async def _release_page(self, url_path: str, page_num: int, page_items: List[Dict]):
+        """Match em ordem de página dentro da seção: página que termina antes das anteriores espera por elas.
+        Link repetido (listagem que andou durante o crawl) fica com a ocorrência da menor (seção, página), a mesma
+        regra do merge (dedupe_page_items), qualquer que seja a ordem em que as páginas terminam. Entre seções a
+        regra é a da chegada - os links carregam a categoria, então não se repetem entre seções"""
+        held = self._held_pages.setdefault(url_path, {})
+        held[page_num] = page_items
+        next_page = self._next_page.get(url_path, 1)
+        while next_page in held:
+            self._process_page_items(held.pop(next_page))
+            next_page += 1
+        self._next_page[url_path] = next_page
+        await self.write_buffer.submit_pending()
     
-    def _extract_auction_info_from_html(self, card) -> Dict:
-        """Extrai informações de praça"""
-        info = {
-            'auction_round': None,
-            'auction_date': None,
-            'current_value': None,
-            'first_round_value': None,
-            'first_round_date': None,
-            'discount_percentage': None,
-        }
+    def _process_page_items(self, page_items: List[Dict]):
+        """Itens de uma página liberada; ocorrências seguintes de um link já casado na run são ignoradas"""
+        for scraped_item in page_items:
+            if scraped_item['link'] in self._seen_links:
+                self.stats['duplicate_links'] += 1
+                continue
+            self._seen_links.add(scraped_item['link'])
+            self._process_scraped_item(scraped_item)
+    
+    async def _parse_response(self, response: ListingResponse) -> ParsedPage:
+        """JSON capturado da rede ou extraído no browser só é normalizado; HTML vai para o parser"""
+        if response.captured is not None:
+            self.stats['pages_json_captured'] += 1
+            return parse_captured_listing(response.captured, self.base_url)
+        if response.extracted is not None:
+            self.stats['pages_dom_extracted'] += 1
+            return parse_extracted_listing(response.extracted, self.base_url)
+        return await self._parse_html(response.html or '')
+    
+    async def _parse_html(self, html: str) -> ParsedPage:
+        """Parse fora do loop do browser quando há pool de workers; inline caso contrário"""
+        if self._parser_pool is None:
+            return parse_listing_html(html, self.base_url, self.parser_backend)
         
-        active_instance = card.select_one('.instance.active')
-        
-        if active_instance:
-            second_date = active_instance.select_one('.card-second-instance-date')
-            first_date = active_instance.select_one('.card-first-instance-date')
-            
-            if second_date:
-                info['auction_round'] = 2
-                date_text = second_date.get_text(strip=True)
-                date_match = re.search(r'(\d{2}/\d{2}/\d{4})\s*às\s*(\d{2}:\d{2})', date_text)
-                if date_match:
-                    date_str = f"{date_match.group(1)} {date_match.group(2)}"
-                    info['auction_date'] = convert_brazilian_datetime_to_postgres(date_str)
-            elif first_date:
-                info['auction_round'] = 1
-                date_text = first_date.get_text(strip=True)
-                date_match = re.search(r'(\d{2}/\d{2}/\d{4})\s*às\s*(\d{2}:\d{2})', date_text)
-                if date_match:
-                    date_str = f"{date_match.group(1)} {date_match.group(2)}"
-                    info['auction_date'] = convert_brazilian_datetime_to_postgres(date_str)
-            
-            value_elem = active_instance.select_one('.card-instance-value')
-            if value_elem:
-                value_text = value_elem.get_text(strip=True)
-                value_match = re.search(r'R\$\s*([\d.]+,\d{2})', value_text)
-                if value_match:
-                    try:
-                        info['current_value'] = float(value_match.group(1).replace('.', '').replace(',', '.'))
-                    except:
-                        pass
-        
-        first_instance = card.select_one('.instance.first.passed')
-        if first_instance:
-            date_elem = first_instance.select_one('.card-first-instance-date')
-            if date_elem:
-                date_text = date_elem.get_text(strip=True)
-                date_match = re.search(r'(\d{2}/\d{2}/\d{4})\s*às\s*(\d{2}:\d{2})', date_text)
-                if date_match:
-                    date_str = f"{date_match.group(1)} {date_match.group(2)}"
-                    info['first_round_date'] = convert_brazilian_datetime_to_postgres(date_str)
-            
-            value_elem = first_instance.select_one('.card-instance-value')
-            if value_elem:
-                value_text = value_elem.get_text(strip=True)
-                value_match = re.search(r'R\$\s*([\d.]+,\d{2})', value_text)
-                if value_match:
-                    try:
-                        info['first_round_value'] = float(value_match.group(1).replace('.', '').replace(',', '.'))
-                    except:
-                        pass
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._parser_pool, parse_listing_html, html, self.base_url, self.parser_backend)
+    
+    def _report_parsed_page(self, parsed: ParsedPage, display_name: str, page_num: int, max_page: int) -> List[Dict]:
+        """Log e stats de uma página parseada; devolve os itens"""
+        if not parsed.card_count:
+            print(f"  ⚠️ [{display_name}] Página {page_num}/{max_page}: Nenhum card encontrado")
+            return []
         
-        if info['first_round_value'] and info['current_value'] and info['auction_round'] == 2:
-            try:
-                discount = ((info['first_round_value'] - info['current_value']) / info['first_round_value']) * 100
-                info['discount_percentage'] = round(discount, 2)
-            except:
-                pass
+        self.stats['pages_scraped'] += 1
+        self.stats['parse_seconds'] += parsed.parse_seconds
+        for field, count in parsed.selector_misses.items():
+            self.selector_misses[field] = self.selector_misses.get(field, 0) + count
+        print(f"  ✅ [{display_name}] Página {page_num}/{max_page}: {parsed.card_count} cards, "
+              f"{len(parsed.items)} itens extraídos")
+        return parsed.items
+    
+    def _process_matches_and_snapshots(self, scraped_data):
+        """Processa matches com base e gera snapshots (qualquer iterável de itens, em streaming)"""
+        for scraped_item in scraped_data:
+            self._process_scraped_item(scraped_item)
         
-        return info
+        self.write_buffer.flush()
     
-    def _process_matches_and_snapshots(self, scraped_data: List[Dict]):
-        """Processa matches com base e gera snapshots"""
-        snapshots_batch = []
-        updates_batch = []
+    def _process_scraped_item(self, scraped_item: Dict):
+        """Match de um item com a base, snapshot e update direto para o buffer de escrita"""
+        if self.write_mode == 'server':
+            self.write_buffer.add_record(scraped_item)
+            return
         
-        for scraped_item in scraped_data:
-            link = scraped_item['link']
-            
-            # Verifica se existe na base
-            db_item = self.db_items_by_link.get(link)
-            
-            if not db_item:
+        link = scraped_item['link']
+        
+        # Verifica se existe na base
+        db_item = self.db_items_by_link.get(link)
+        
+        if not db_item:
+            with self._stats_lock:
                 self.stats['items_new'] += 1
-                continue
-            
+            return
+        
+        with self._stats_lock:
             self.stats['items_matched'] += 1
+        
+        # Item do payload JSON pode não trazer todas as colunas: as ausentes ficam com o valor da base (sem diff)
+        if any(column not in scraped_item for column in self.UPDATE_COLUMNS):
+            scraped_item = {**{column: db_item.get(column) for column in self.UPDATE_COLUMNS}, **scraped_item}
+        
+        # Busca último snapshot
+        last_snap = self.last_snapshots.get(db_item['id'])
+        
+        # Calcula mudanças; a política decide se o snapshot é gravado
+        snapshot = self._create_snapshot(db_item, scraped_item, last_snap)
+        reason = self.snapshot_policy.decide(snapshot, last_snap) if snapshot else None
+        if snapshot and reason is None:
+            with self._stats_lock:
+                self.stats['snapshots_suppressed'] += 1
+        
+        if snapshot and reason:
+            self.write_buffer.add_snapshot(snapshot)
+            self.last_snapshots[db_item['id']] = snapshot
             
-            # Busca último snapshot
-            last_snap = self.last_snapshots.get(db_item['id'])
-            
-            # Calcula mudanças
-            snapshot = self._create_snapshot(db_item, scraped_item, last_snap)
-            
-            if snapshot:
-                snapshots_batch.append(snapshot)
+            # Contadores também somados pela thread de escrita no modo servidor: sempre sob o lock
+            with self._stats_lock:
                 self.stats['snapshots_created'] += 1
-                
-                # Detecta mudanças para stats
+                self.stats[f'snapshots_{reason}'] += 1
                 if snapshot['bid_status_changed']:
                     self.stats['bid_changes'] += 1
                 if snapshot.get('value_change') and abs(snapshot['value_change']) > 0:
                     self.stats['value_changes'] += 1
                 if snapshot['status_changed']:
                     self.stats['status_changes'] += 1
-            
-            # Prepara update da tabela base
-            update = self._create_update(db_item, scraped_item)
-            if update:
-                updates_batch.append(update)
-        
-        # Insere snapshots em lotes
-        if snapshots_batch:
-            print(f"\n💾 Inserindo {len(snapshots_batch)} snapshots...")
-            self._insert_snapshots_batch(snapshots_batch)
         
-        # Atualiza tabela base em lotes
-        if updates_batch:
-            print(f"\n🔄 Atualizando {len(updates_batch)} itens na tabela base...")
-            self._update_base_items_batch(updates_batch)
+        # Prepara update da tabela base - só colunas que mudaram; sem mudança, só last_scraped_at
+        update = self._create_update(db_item, scraped_item)
+        if update:
+            self.write_buffer.add_update(update)
+        elif update is not None:
+            self.write_buffer.add_touch(db_item['id'])
     
     def _create_snapshot(self, db_item: Dict, scraped_item: Dict, last_snap: Optional[Dict]) -> Optional[Dict]:
         """Cria snapshot de monitoramento"""
@@ -500,7 +3227,7 @@ class MegaLeiloesMonitor:
             round_changed = scraped_item.get('auction_round') != old_round
             
             old_auction_date = last_snap['auction_date'] if last_snap else db_item.get('auction_date')
-            auction_date_changed = scraped_item.get('auction_date') != old_auction_date
+            auction_date_changed = not same_db_value(old_auction_date, scraped_item.get('auction_date'))
             
             old_is_active = last_snap['is_active'] if last_snap else db_item.get('is_active', True)
             status_changed = scraped_item.get('is_active') != old_is_active
@@ -545,73 +3272,214 @@ class MegaLeiloesMonitor:
                 'auction_type': db_item.get('auction_type'),
                 'hours_since_last_snapshot': hours_since_last,
                 'value_velocity': value_velocity,
-                'metadata': {'source': 'automated_monitoring'}
+                'run_id': self.run_id,
+                'metadata': {'source': 'automated_monitoring', 'run_id': self.run_id}
             }
             
             return snapshot
         
         except Exception as e:
-            self.stats['errors'] += 1
+            with self._stats_lock:
+                self.stats['errors'] += 1
             print(f"⚠️ Erro ao criar snapshot: {e}")
             return None
     
+    # Colunas da tabela base espelhadas do scrape
+    UPDATE_COLUMNS = ('value', 'has_bid', 'auction_round', 'auction_date', 'first_round_value', 'first_round_date',
+                      'discount_percentage', 'is_active')
+    
     def _create_update(self, db_item: Dict, scraped_item: Dict) -> Optional[Dict]:
-        """Cria update para tabela base"""
+        """Update só com as colunas que mudaram; {} se nada mudou (item só é tocado), None em erro"""
         try:
+            changed = {
+                column: scraped_item.get(column)
+                for column in self.UPDATE_COLUMNS
+                if not same_db_value(db_item.get(column), scraped_item.get(column))
+            }
+            if not changed:
+                return {}
+            
+            now = datetime.now(timezone.utc).isoformat()
             update = {
                 'id': db_item['id'],
-                'value': scraped_item.get('value'),
-                'has_bid': scraped_item.get('has_bid'),
-                'auction_round': scraped_item.get('auction_round'),
-                'auction_date': scraped_item.get('auction_date'),
-                'first_round_value': scraped_item.get('first_round_value'),
-                'first_round_date': scraped_item.get('first_round_date'),
-                'discount_percentage': scraped_item.get('discount_percentage'),
-                'is_active': scraped_item.get('is_active'),
-                'updated_at': datetime.now(timezone.utc).isoformat(),
-                'last_scraped_at': datetime.now(timezone.utc).isoformat(),
+                **changed,
+                'updated_at': now,
+                'last_scraped_at': now,
             }
             
+            # O item em memória passa a refletir a base (link repetido entre seções não gera update de novo)
+            db_item.update(changed)
             return update
         
         except Exception as e:
-            self.stats['errors'] += 1
+            with self._stats_lock:
+                self.stats['errors'] += 1
             return None
     
-    def _insert_snapshots_batch(self, snapshots: List[Dict]):
-        """Insere snapshots em lotes"""
-        try:
-            batch_size = 500
-            for i in range(0, len(snapshots), batch_size):
-                batch = snapshots[i:i+batch_size]
-                self.supabase.schema('auctions').table('megaleiloes_monitoring').insert(batch).execute()
-                print(f"  ✅ Lote {i//batch_size + 1}: {len(batch)} snapshots inseridos")
+    def _insert_snapshots_batch(self, snapshots: List[Dict]) -> List[Dict]:
+        """Insere snapshots em chunks paralelos (limite MEGA_WRITE_CONCURRENCY); devolve o que ficou pendente"""
+        chunks = self._snapshot_chunks(snapshots)
+        with ThreadPoolExecutor(max_workers=min(self.write_concurrency, len(chunks)) or 1) as pool:
+            leftovers = pool.map(lambda chunk: self._write_bisecting(self._insert_snapshot_chunk, chunk, 'snapshots'), chunks)
+            return [row for leftover in leftovers for row in leftover]
+    
+    def _snapshot_chunks(self, snapshots: List[Dict]) -> List[List[Dict]]:
+        """Chunks limitados pelo tamanho adaptativo em linhas e pelo payload em bytes"""
+        chunks, chunk, chunk_bytes = [], [], 0
+        for snapshot in snapshots:
+            size = len(json.dumps(snapshot, default=str))
+            if chunk and (len(chunk) >= self._snapshot_chunk_rows or chunk_bytes + size > self.snapshot_chunk_bytes):
+                chunks.append(chunk)
+                chunk, chunk_bytes = [], 0
+            chunk.append(snapshot)
+            chunk_bytes += size
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+    
+    def _insert_snapshot_chunk(self, chunk: List[Dict]):
+        """Um INSERT idempotente por (item_id, run_id); a latência observada ajusta o tamanho dos próximos chunks rumo a MEGA_WRITE_LATENCY_TARGET_S"""
+        started = time.perf_counter()
+        self.supabase.schema('auctions').table('megaleiloes_monitoring') \
+            .upsert(chunk, on_conflict='item_id,run_id', ignore_duplicates=True) \
+            .execute()
+        per_row = (time.perf_counter() - started) / len(chunk)
         
-        except Exception as e:
-            print(f"❌ Erro ao inserir snapshots: {e}")
-            self.stats['errors'] += len(snapshots)
+        ideal = self.write_latency_target / per_row if per_row > 0 else self.snapshot_chunk_max_rows
+        with self._stats_lock:
+            self.stats['snapshots_inserted'] += len(chunk)
+            self._snapshot_chunk_rows = int(min(self.snapshot_chunk_max_rows, max(
+                self.snapshot_chunk_min_rows, (self._snapshot_chunk_rows + ideal) / 2)))
     
-    def _update_base_items_batch(self, updates: List[Dict]):
-        """Atualiza tabela base em lotes"""
-        try:
-            for update in updates:
-                try:
-                    # Remove o ID do dicionário de update (usado apenas no WHERE)
-                    item_id = update.pop('id')
-                    
-                    self.supabase.schema('auctions').table('megaleiloes_items') \
-                        .update(update) \
-                        .eq('id', item_id) \
-                        .execute()
-                    self.stats['items_updated'] += 1
-                except Exception as e:
-                    print(f"  ⚠️ Erro ao atualizar item {update.get('id', 'unknown')}: {e}")
+    # Contador de megaleiloes_apply_scraped -> stats da run
+    SERVER_APPLY_STATS = {
+        'matched': 'items_matched',
+        'snapshots': 'snapshots_inserted',
+        'snapshots_all': 'snapshots_all',
+        'snapshots_first': 'snapshots_first',
+        'snapshots_change': 'snapshots_change',
+        'snapshots_heartbeat': 'snapshots_heartbeat',
+        'suppressed': 'snapshots_suppressed',
+        'bid_changes': 'bid_changes',
+        'value_changes': 'value_changes',
+        'status_changes': 'status_changes',
+        'updated': 'items_updated',
+        'touched': 'items_touched',
+    }
+    
+    def _apply_scraped_batch(self, records: List[Dict], run_id: Optional[str] = None,
+                             scraped_at: Optional[str] = None) -> List[Dict]:
+        """Modo servidor: um lote = uma transação no Postgres; devolve o que ficou pendente.
+        Lote do journal chega com o run_id e o horário do scrape originais"""
+        params = {
+            'p_run_id': run_id or self.run_id,
+            'p_policy': self.snapshot_policy.mode,
+            'p_fields': self.snapshot_policy.fields,
+            'p_heartbeat_hours': self.snapshot_policy.heartbeat_hours,
+            'p_scraped_at': scraped_at or datetime.now(timezone.utc).isoformat(),
+        }
+        return self._write_bisecting(lambda chunk: self._apply_scraped_chunk(chunk, params), records, 'registros')
+    
+    def _apply_scraped_chunk(self, chunk: List[Dict], params: Dict):
+        result = self.supabase.schema('auctions').rpc('megaleiloes_apply_scraped', {
+            'p_records': chunk,
+            **params,
+        }).execute().data or {}
+        
+        with self._stats_lock:
+            for key, stat in self.SERVER_APPLY_STATS.items():
+                self.stats[stat] += result.get(key, 0)
+            self.stats['snapshots_created'] += result.get('snapshots', 0)
+            self.stats['items_new'] += result.get('records', 0) - result.get('matched', 0)
+    
+    def _update_base_items_batch(self, updates: List[Dict]) -> List[Dict]:
+        """Atualiza tabela base em chunks via RPC (um POST por chunk); devolve o que ficou pendente"""
+        chunk_size = max(1, int(os.getenv('MEGA_UPDATE_CHUNK', '500')))
+        leftover = []
+        for i in range(0, len(updates), chunk_size):
+            leftover.extend(self._write_bisecting(self._update_items_chunk, updates[i:i+chunk_size], 'itens'))
+        
+        print(f"  ✅ {self.stats['items_updated']} itens atualizados")
+        return leftover
+    
+    def _touch_items_batch(self, item_ids: List) -> List:
+        """Itens sem mudança: last_scraped_at num único UPDATE set-based por lote de ids; devolve os ids pendentes.
+        Passa por _write_bisecting como os outros writers (retry, backoff e classificação do erro)"""
+        scraped_at = datetime.now(timezone.utc).isoformat()
+        leftover = self._write_bisecting(lambda chunk: self._touch_items_chunk(chunk, scraped_at),
+                                         [{'id': item_id} for item_id in item_ids], 'itens sem mudança')
+        return [row['id'] for row in leftover]
+    
+    def _touch_items_chunk(self, chunk: List[Dict], scraped_at: str):
+        touched = self.supabase.schema('auctions').rpc('megaleiloes_touch_items', {
+            'p_items': chunk,
+            'p_scraped_at': scraped_at,
+        }).execute().data
+        with self._stats_lock:
+            self.stats['items_touched'] += touched if isinstance(touched, int) else len(chunk)
+    
+    def _update_items_chunk(self, chunk: List[Dict]):
+        """Um chunk de updates (só as colunas presentes em cada objeto mudam)"""
+        updated = self.supabase.schema('auctions') \
+            .rpc('megaleiloes_bulk_update_items', {'p_updates': chunk}) \
+            .execute().data
+        with self._stats_lock:
+            self.stats['items_updated'] += updated if isinstance(updated, int) else len(chunk)
+    
+    def _write_bisecting(self, write: Callable[[List[Dict]], None], rows: List[Dict], label: str) -> List[Dict]:
+        """Escreve um chunk; erro transitório tem retry com backoff, erro de dados divide ao meio até isolar as linhas ruins.
+        Devolve as linhas que seguem pendentes (erro transitório mesmo após os retries)"""
+        error = None
+        for attempt in range(self.write_retries + 1):
+            started = time.perf_counter()
+            try:
+                write(rows)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                if not self._is_transient_write_error(e) or attempt == self.write_retries:
+                    break
+                delay = 0.5 * 2 ** attempt * (1 + random.random())
+                print(f"  ⚠️ Chunk de {len(rows)} {label} falhou ({e}) - nova tentativa em {delay:.1f}s")
+                time.sleep(delay)
+        
+        if error is not None:
+            if self._is_transient_write_error(error):
+                # Base fora do ar: dividir não adianta, o chunk inteiro fica pendente (journal)
+                print(f"  ⚠️ Chunk de {len(rows)} {label} não gravado após {self.write_retries} retries: {error}")
+                with self._stats_lock:
                     self.stats['errors'] += 1
-            
-            print(f"  ✅ {self.stats['items_updated']} itens atualizados")
+                return rows
+            if len(rows) == 1:
+                print(f"  ⚠️ Linha rejeitada ({label}, id {rows[0].get('id', rows[0].get('item_id', '?'))}): {error}")
+                with self._stats_lock:
+                    self.stats['errors'] += 1
+                return []
+            print(f"  ⚠️ Chunk de {len(rows)} {label} falhou ({error}) - dividindo")
+            middle = len(rows) // 2
+            return self._write_bisecting(write, rows[:middle], label) + self._write_bisecting(write, rows[middle:], label)
         
-        except Exception as e:
-            print(f"❌ Erro ao atualizar itens: {e}")
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self.stats['write_seconds'] += elapsed
+            self.stats['write_chunks'] += 1
+            self.stats['write_chunk_max_seconds'] = max(self.stats['write_chunk_max_seconds'], elapsed)
+        print(f"  ✅ Chunk: {len(rows)} {label} em {elapsed:.2f}s")
+        return []
+    
+    @staticmethod
+    def _is_transient_write_error(error: Exception) -> bool:
+        """Erros de dados/constraint/SQL (SQLSTATE 22, 23, 42), do PostgREST (PGRST*) e HTTP 4xx não melhoram com
+        retry; o resto (rede, 5xx, timeout, 408/429) sim"""
+        code = getattr(error, 'code', None)
+        if isinstance(code, str) and (code[:2] in ('22', '23', '42') or code.startswith('PGRST')):
+            return False
+        
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+        if status is None and isinstance(code, (int, str)) and str(code).isdigit() and len(str(code)) == 3:
+            status = int(code)
+        return not (isinstance(status, int) and 400 <= status < 500 and status not in (408, 429))
     
     def _print_stats(self, elapsed: float):
         """Imprime estatísticas finais"""
@@ -624,12 +3492,45 @@ class MegaLeiloesMonitor:
         print(f"\n  Scrape:")
         print(f"    • Páginas processadas: {self.stats['pages_scraped']}")
         print(f"    • Itens scrapados: {self.stats['items_scraped']}")
+        print(f"    • Tempo de parse (CPU somada): {self.stats['parse_seconds']:.1f}s")
+        if self.selector_misses:
+            detail = ', '.join(f"{field}={count}" for field, count in sorted(self.selector_misses.items()))
+            print(f"    • Seletores sem resultado: {detail}")
+        if self.stats['pages_resumed']:
+            print(f"    • Páginas retomadas do checkpoint: {self.stats['pages_resumed']}")
+        if self.stats['duplicate_links']:
+            print(f"    • Links repetidos ignorados (vale a menor página): {self.stats['duplicate_links']}")
+        print(f"    • Páginas via HTTP / Chromium: {self.stats['pages_http']} / {self.stats['pages_browser']} "
+              f"({self.stats['http_fallbacks']} fallbacks, {self.stats['pages_dom_extracted']} extraídas no DOM, "
+              f"{self.stats['pages_json_captured']} via JSON)")
+        if self.stats['throttled_responses'] or self.stats['circuit_breaker_trips']:
+            print(f"    • Respostas com pressão (429/5xx/erro): {self.stats['throttled_responses']} | "
+                  f"Retry-After: {self.stats['retry_after_waits']} | breaker: {self.stats['circuit_breaker_trips']}")
+        if self.resource_policy is not None and self.stats['pages_browser']:
+            print(f"    • Requests do Chromium liberados / bloqueados: {self.stats['requests_allowed']} / "
+                  f"{self.stats['requests_blocked']} ({self.stats['bytes_allowed'] / 1024 / 1024:.1f} MB baixados)")
+        
+        readiness_timeouts = {k: v for k, v in self.stats.items() if k.startswith('readiness_timeouts_')}
+        if readiness_timeouts:
+            detail = ', '.join(f"{k.replace('readiness_timeouts_', '')}={v}" for k, v in readiness_timeouts.items())
+            print(f"    • Timeouts de readiness: {detail}")
         print(f"\n  Match:")
         print(f"    • Itens encontrados na base: {self.stats['items_matched']}")
         print(f"    • Itens novos (não na base): {self.stats['items_new']}")
         print(f"\n  Monitoramento:")
-        print(f"    • Snapshots criados: {self.stats['snapshots_created']}")
+        print(f"    • Snapshots criados: {self.stats['snapshots_created']} (primeiro: {self.stats['snapshots_first']}, "
+              f"mudança: {self.stats['snapshots_change']}, heartbeat: {self.stats['snapshots_heartbeat']}"
+              f"{', política all: ' + str(self.stats['snapshots_all']) if self.stats['snapshots_all'] else ''})")
+        print(f"    • Snapshots suprimidos (sem mudança): {self.stats['snapshots_suppressed']}")
         print(f"    • Itens atualizados: {self.stats['items_updated']}")
+        print(f"    • Itens sem mudança (só last_scraped_at): {self.stats['items_touched']}")
+        print(f"    • Snapshots gravados: {self.stats['snapshots_inserted']}")
+        print(f"    • Tempo de escrita na base: {self.stats['write_seconds']:.1f}s "
+              f"(scrape esperando a fila: {self.stats['write_backpressure_seconds']:.1f}s)")
+        if self.stats['write_chunks']:
+            print(f"    • Chunks de escrita: {self.stats['write_chunks']} | média "
+                  f"{self.stats['write_seconds'] / self.stats['write_chunks']:.2f}s | máx "
+                  f"{self.stats['write_chunk_max_seconds']:.2f}s | próximo chunk de snapshots: {self._snapshot_chunk_rows}")
         print(f"\n  Mudanças detectadas:")
         print(f"    • Mudanças de lances: {self.stats['bid_changes']}")
         print(f"    • Mudanças de valor: {self.stats['value_changes']}")
@@ -645,9 +3546,55 @@ class MegaLeiloesMonitor:
 
 def main():
     """Execução principal"""
+    parser = argparse.ArgumentParser(description="MegaLeilões - monitoramento")
+    parser.add_argument('--resume', action='store_true',
+                        help="retoma a partir do checkpoint da run interrompida (pula páginas já concluídas)")
+    parser.add_argument('--full-sync', action='store_true',
+                        help="ignora o cache local de estado e recarrega itens e snapshots da base")
+    parser.add_argument('--shard', type=parse_shard_spec, metavar='i/N',
+                        help="scrape só os blocos de páginas do shard i de N (0 <= i < N) e grava os itens para o merge")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    merge = subparsers.add_parser('merge', help="consolida as saídas dos shards e roda match/snapshot/update uma vez")
+    merge.add_argument('shard_files', nargs='*')
+    merge.add_argument('--frontier', metavar='RUN_ID', help="consolida os resultados da fronteira da run em vez de arquivos")
+    
+    subparsers.add_parser('replay-journal', help="reenvia as escritas pendentes do journal local, sem scrape")
+    
+    worker = subparsers.add_parser('worker', help="worker da fronteira distribuída (qualquer número por run)")
+    worker.add_argument('--run-id', default=os.getenv('MEGA_RUN_ID') or os.getenv('GITHUB_RUN_ID'),
+                        help="run compartilhada pelos workers (padrão: MEGA_RUN_ID ou GITHUB_RUN_ID)")
+    
+    bench = subparsers.add_parser('bench-parse', help="paridade e benchmark dos parsers sobre páginas HTML gravadas")
+    bench.add_argument('html_files', nargs='+')
+    bench.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    bench.add_argument('--repeat', type=int, default=5)
+    bench.add_argument('--backends', default=','.join(ALL_PARSER_BACKENDS))
+    bench.add_argument('--browser', action='store_true', help="confere também a extração no Chromium (modo dom)")
+    
+    args = parser.parse_args()
+    if args.command == 'merge' and not args.shard_files and not args.frontier:
+        parser.error("merge: informe os arquivos dos shards ou --frontier RUN_ID")
+    if args.command == 'worker' and not args.run_id:
+        parser.error("worker: informe --run-id (ou MEGA_RUN_ID)")
+    
+    if args.command == 'bench-parse':
+        benchmark_parsing(args.html_files, workers=args.workers, repeat=args.repeat,
+                          backends=[b for b in args.backends.split(',') if b], browser=args.browser)
+        return
+    
     try:
         monitor = MegaLeiloesMonitor()
-        monitor.run()
+        if args.command == 'merge':
+            monitor.run_merge(args.shard_files, run_id=args.frontier, full_sync=args.full_sync)
+        elif args.command == 'replay-journal':
+            monitor.replay_journal()
+        elif args.command == 'worker':
+            monitor.run_worker(args.run_id)
+        elif args.shard is not None:
+            monitor.run_shard(args.shard, resume=args.resume)
+        else:
+            monitor.run(resume=args.resume, full_sync=args.full_sync)
     
     except Exception as e:
         print(f"\n❌ Erro fatal: {e}")
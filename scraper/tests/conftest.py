@@ -0,0 +1,97 @@
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(TESTS_DIR, 'fixtures')
+
+# O monitor é um script único em scraper/, não um pacote instalado
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+BASE_URL = 'https://www.megaleiloes.com.br'
+LISTING_FIXTURES = sorted(name for name in os.listdir(FIXTURES_DIR) if name.startswith('listing_'))
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as fh:
+        return fh.read()
+
+
+@pytest.fixture(params=LISTING_FIXTURES)
+def listing_html(request) -> str:
+    """HTML gravado de uma página de listagem"""
+    return read_fixture(request.param)
+
+
+@pytest.fixture
+def monitor(tmp_path, monkeypatch):
+    """Monitor com env mínimo, sem journal/cache em disco (cada teste liga o que precisa)"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('SUPABASE_URL', 'http://localhost:54321')
+    monkeypatch.setenv('SUPABASE_KEY', 'test-' + 'x' * 40)
+    monkeypatch.setenv('MEGA_JOURNAL_DIR', '')
+    monkeypatch.setenv('MEGA_STATE_CACHE', '')
+    monkeypatch.setenv('MEGA_BACKGROUND_WRITES', '0')
+    from megaleiloes_monitor import MegaLeiloesMonitor
+    return MegaLeiloesMonitor()
+
+
+class FakeSupabase:
+    """Subconjunto do query builder do PostgREST usado por _scan_since, sobre linhas em memória
+    ({tabela: linhas}). max_rows simula o teto de linhas do servidor (página mais curta que o limit)"""
+    
+    def __init__(self, tables, max_rows=None):
+        self.tables = tables
+        self.max_rows = max_rows
+        self.queries = 0
+    
+    def schema(self, name):
+        return self
+    
+    def table(self, name):
+        return _FakeQuery(self, self.tables.get(name, []))
+
+
+class _FakeQuery:
+    def __init__(self, client, rows):
+        self.client = client
+        self.rows = rows
+        self.filters = []
+        self.orders = []
+        self.size = None
+    
+    def select(self, columns):
+        return self
+    
+    def gt(self, column, value):
+        self.filters.append(lambda row: row[column] > value)
+        return self
+    
+    def eq(self, column, value):
+        self.filters.append(lambda row: row[column] == value)
+        return self
+    
+    def or_(self, expression):
+        # '{t}.gt."{v}",and({t}.eq."{v}",{k}.gt."{key}")' - cursor do keyset
+        import re
+        time_column, value, key_column, key = re.fullmatch(
+            r'(\w+)\.gt\."([^"]+)",and\(\w+\.eq\."[^"]+",(\w+)\.gt\."([^"]+)"\)', expression).groups()
+        self.filters.append(lambda row: row[time_column] > value
+                            or (row[time_column] == value and str(row[key_column]) > key))
+        return self
+    
+    def order(self, column, desc=False):
+        self.orders.append(column)
+        return self
+    
+    def limit(self, size):
+        self.size = size
+        return self
+    
+    def execute(self):
+        self.client.queries += 1
+        rows = [row for row in self.rows if all(check(row) for check in self.filters)]
+        rows.sort(key=lambda row: tuple(str(row[column]) for column in self.orders))
+        limit = min(self.size, self.client.max_rows or self.size)
+        return type('Response', (), {'data': rows[:limit]})
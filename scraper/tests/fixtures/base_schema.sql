@@ -0,0 +1,53 @@
+-- Recorte das tabelas do schema auctions usadas pelo monitor (o schema completo vive no projeto Supabase).
+-- Base mínima para aplicar supabase/migrations num Postgres local nos testes.
+
+create schema if not exists auctions;
+
+create table auctions.megaleiloes_items (
+    id                  bigserial primary key,
+    external_id         text not null,
+    source              text not null,
+    link                text not null,
+    value               numeric,
+    has_bid             boolean,
+    auction_round       integer,
+    auction_date        timestamptz,
+    first_round_value   numeric,
+    first_round_date    timestamptz,
+    discount_percentage numeric,
+    is_active           boolean,
+    category            text,
+    city                text,
+    state               text,
+    auction_type        text,
+    updated_at          timestamptz default now(),
+    last_scraped_at     timestamptz
+);
+
+create table auctions.megaleiloes_monitoring (
+    id                        bigserial primary key,
+    item_id                   bigint not null references auctions.megaleiloes_items (id),
+    external_id               text,
+    snapshot_at               timestamptz not null,
+    days_until_auction        integer,
+    current_value             numeric,
+    value_change              numeric,
+    value_change_percentage   numeric,
+    first_round_value         numeric,
+    discount_from_first_round numeric,
+    has_bid                   boolean,
+    bid_status_changed        boolean,
+    auction_round             integer,
+    round_changed             boolean,
+    auction_date              timestamptz,
+    auction_date_changed      boolean,
+    is_active                 boolean,
+    status_changed            boolean,
+    category                  text,
+    city                      text,
+    state                     text,
+    auction_type              text,
+    hours_since_last_snapshot double precision,
+    value_velocity            double precision,
+    metadata                  jsonb
+);
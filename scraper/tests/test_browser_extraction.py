@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from conftest import BASE_URL, LISTING_FIXTURES, read_fixture
+from megaleiloes_monitor import async_playwright, extract_listing_in_browser, parse_extracted_listing, parse_listing_html
+
+
+async def _extract_all(pages):
+    """Roda o modo 'dom' (CARD_EXTRACT_JS) sobre cada HTML carregado via page.set_content"""
+    async with async_playwright() as p:
+        try:
+            browser = await p.chromium.launch(headless=True, args=['--no-sandbox'])
+        except Exception as e:
+            pytest.skip(f"Chromium indisponível: {str(e).splitlines()[0]}")
+        try:
+            page = await browser.new_page()
+            results = []
+            for html in pages:
+                await page.set_content(html, wait_until='domcontentloaded')
+                results.append(parse_extracted_listing(await extract_listing_in_browser(page), BASE_URL))
+            return results
+        finally:
+            await browser.close()
+
+
+@pytest.fixture(scope='module')
+def extracted_pages():
+    return dict(zip(LISTING_FIXTURES, asyncio.run(_extract_all([read_fixture(name) for name in LISTING_FIXTURES]))))
+
+
+@pytest.mark.parametrize('name', LISTING_FIXTURES)
+def test_browser_extraction_matches_html_parser(extracted_pages, name):
+    expected = parse_listing_html(read_fixture(name), BASE_URL, 'html.parser')
+    extracted = extracted_pages[name]
+    
+    assert extracted.max_page == expected.max_page
+    assert extracted.card_count == expected.card_count
+    assert extracted.items == expected.items
+    assert extracted.selector_misses == expected.selector_misses
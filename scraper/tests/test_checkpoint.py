@@ -0,0 +1,47 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from megaleiloes_monitor import CrawlCheckpoint
+
+
+def write_checkpoint(path, created_at=None):
+    checkpoint = CrawlCheckpoint(str(path))
+    checkpoint.record_run('window-20261017T0000Z')
+    checkpoint.record_section('imoveis', 2)
+    checkpoint.record_page('imoveis', 1, [{'link': 'https://www.megaleiloes.com.br/x-j1'}])
+    checkpoint.close()
+    if created_at is not None:
+        lines = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+        lines[0]['created_at'] = created_at
+        if created_at == 'drop':
+            del lines[0]['created_at']
+        path.write_text(''.join(json.dumps(line) + '\n' for line in lines), encoding='utf-8')
+
+
+def test_resume_within_window_keeps_pages(tmp_path):
+    path = tmp_path / 'checkpoint.ndjson'
+    write_checkpoint(path)
+    
+    checkpoint = CrawlCheckpoint(str(path), resume=True, max_age_hours=3)
+    assert checkpoint.run_id == 'window-20261017T0000Z'
+    assert checkpoint.is_done('imoveis', 1)
+    assert checkpoint.missing_units(['imoveis']) == [('imoveis', 2)]
+
+
+def test_stale_checkpoint_is_ignored(tmp_path):
+    path = tmp_path / 'checkpoint.ndjson'
+    write_checkpoint(path, (datetime.now(timezone.utc) - timedelta(hours=4)).isoformat())
+    
+    checkpoint = CrawlCheckpoint(str(path), resume=True, max_age_hours=3)
+    assert checkpoint.run_id is None
+    assert not checkpoint.is_done('imoveis', 1)
+    assert checkpoint.missing_units(['imoveis']) == [('imoveis', None)]
+    checkpoint.close()
+    assert path.read_text(encoding='utf-8') == ''
+
+
+def test_checkpoint_without_timestamp_is_ignored(tmp_path):
+    path = tmp_path / 'checkpoint.ndjson'
+    write_checkpoint(path, 'drop')
+    
+    assert CrawlCheckpoint(str(path), resume=True, max_age_hours=3).run_id is None
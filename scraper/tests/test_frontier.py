@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from megaleiloes_monitor import CrawlFrontier, SqliteFrontier
+
+
+@pytest.fixture
+def frontier(tmp_path):
+    frontier = SqliteFrontier(str(tmp_path / 'frontier.sqlite'), 'run-1', lease_seconds=60, max_attempts=2)
+    frontier.seed('imoveis', 1, 3)
+    return frontier
+
+
+def test_incomplete_frontier_fails_on_instantiation():
+    class Partial(CrawlFrontier):
+        def seed(self, section, first, last):
+            pass
+    
+    with pytest.raises(TypeError, match='claim'):
+        Partial('run-1')
+
+
+def test_claim_complete_and_results(frontier):
+    claimed = frontier.claim('w1', 2)
+    
+    assert claimed == [('imoveis', 1), ('imoveis', 2)]
+    assert frontier.claim('w2', 5) == [('imoveis', 3)]
+    assert frontier.complete('w1', 'imoveis', 1, [{'link': 'a'}])
+    assert not frontier.complete('w2', 'imoveis', 1, [{'link': 'b'}])
+    assert frontier.open_count() == 2
+    
+    pages, pending = frontier.results()
+    assert pages == {('imoveis', 1): [{'link': 'a'}]}
+    assert sorted(pending) == [('imoveis', 2), ('imoveis', 3)]
+
+
+def test_seed_is_idempotent(frontier):
+    frontier.claim('w1', 1)
+    frontier.seed('imoveis', 1, 3)
+    
+    assert frontier.claim('w1', 5) == [('imoveis', 2), ('imoveis', 3)]
+
+
+def test_fail_requeues_until_max_attempts(frontier):
+    frontier.claim('w1', 1)
+    frontier.fail('w1', 'imoveis', 1, 'timeout')
+    assert frontier.claim('w2', 1) == [('imoveis', 1)]
+    
+    frontier.fail('w2', 'imoveis', 1, 'timeout')
+    assert ('imoveis', 1) not in frontier.claim('w3', 5)
+    assert frontier.open_count() == 2
+
+
+def test_fail_from_other_worker_is_ignored(frontier):
+    frontier.claim('w1', 1)
+    frontier.fail('w2', 'imoveis', 1, 'lease perdido')
+    
+    assert frontier.claim('w2', 1) == [('imoveis', 2)]
+
+
+def test_expired_lease_is_reclaimed(frontier, monkeypatch):
+    frontier.claim('w1', 1)
+    assert frontier.heartbeat('w1', [('imoveis', 1)]) == 1
+    assert frontier.heartbeat('w2', [('imoveis', 1)]) == 0
+    
+    later = time.time() + 120
+    monkeypatch.setattr(time, 'time', lambda: later)
+    assert frontier.claim('w2', 1) == [('imoveis', 1)]
@@ -0,0 +1,80 @@
+import pytest
+
+from conftest import BASE_URL
+from megaleiloes_monitor import _json_datetime, find_json_last_page, find_listing_records, item_from_json_record
+
+LOTS = [
+    {'url': '/imoveis/apartamentos/sp/sao-paulo/apto-1-j1001', 'valor_atual': 'R$ 150.000,00', 'praca': 2,
+     'data_praca': '10/11/2026 às 15:30', 'valor_1_praca': 300000, 'total_lances': 3, 'status': 'Aberto'},
+    {'url': '/imoveis/casas/sp/campinas/casa-2-j1002', 'valor_atual': 99000.5, 'praca': 1,
+     'data_praca': '2026-11-12T10:00:00', 'total_lances': 0, 'status': 'Encerrado'},
+    {'url': '/veiculos/carros/sp/santos/carro-3-j1003', 'valor_atual': '45.000,00', 'praca': 1,
+     'data_praca': '2026-11-13T13:00:00Z', 'lances': [], 'ativo': True},
+]
+
+
+def test_find_listing_records_picks_largest_list():
+    payload = {'banners': [{'url': '/promo', 'price': 10}], 'data': {'lots': LOTS, 'meta': {'total': 3}}}
+    assert find_listing_records(payload) == LOTS
+
+
+def test_find_listing_records_ignores_lists_without_lots():
+    assert find_listing_records({'menu': [{'label': 'Imóveis', 'url': '/imoveis'}], 'ids': [1, 2, 3]}) is None
+    assert find_listing_records([]) is None
+
+
+def test_find_listing_records_accepts_top_level_list():
+    assert find_listing_records(LOTS) == LOTS
+
+
+@pytest.mark.parametrize('payload, expected', [
+    ({'lots': LOTS, 'last_page': 42}, 42),
+    ({'data': {'pagination': {'totalPages': 7}}}, 7),
+    ({'lots': LOTS, 'last_page': True}, None),
+    ({'lots': LOTS}, None),
+    (LOTS, None),
+])
+def test_find_json_last_page(payload, expected):
+    assert find_json_last_page(payload) == expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('10/11/2026 às 15:30', '2026-11-10T15:30:00-03:00'),
+    ('10/11/2026 15:30', '2026-11-10T15:30:00-03:00'),
+    ('2026-11-12T10:00:00', '2026-11-12T10:00:00-03:00'),
+    ('2026-11-13T13:00:00Z', '2026-11-13T13:00:00+00:00'),
+    ('amanhã', None),
+    (1731250000, None),
+    (None, None),
+])
+def test_json_datetime(value, expected):
+    assert _json_datetime(value) == expected
+
+
+def test_item_from_json_record_second_round():
+    item = item_from_json_record(LOTS[0], BASE_URL)
+    assert item == {
+        'link': f'{BASE_URL}/imoveis/apartamentos/sp/sao-paulo/apto-1-j1001',
+        'value': 150000.0,
+        'has_bid': True,
+        'auction_round': 2,
+        'auction_date': '2026-11-10T15:30:00-03:00',
+        'first_round_value': 300000.0,
+        'discount_percentage': 50.0,
+        'is_active': True,
+    }
+
+
+def test_item_from_json_record_leaves_out_missing_fields():
+    item = item_from_json_record(LOTS[1], BASE_URL)
+    
+    assert item['is_active'] is False
+    assert item['has_bid'] is False
+    # Payload sem as chaves de 1ª praça: campos fora do item (a base mantém o valor), não None
+    assert 'first_round_value' not in item
+    assert 'first_round_date' not in item
+    assert 'discount_percentage' not in item
+
+
+def test_item_from_json_record_rejects_javascript_links():
+    assert item_from_json_record({'url': 'javascript:void(0)', 'valor': 10}, BASE_URL) is None
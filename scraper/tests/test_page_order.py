@@ -0,0 +1,66 @@
+import asyncio
+import itertools
+
+import pytest
+
+LINK = 'https://www.megaleiloes.com.br/imoveis/apartamentos/sp/sao-paulo/apartamento-j1001'
+OTHER = LINK.replace('j1001', 'j1002')
+
+
+def scraped(link, value):
+    return {'link': link, 'value': value, 'has_bid': False, 'auction_round': 1, 'auction_date': None,
+            'first_round_value': None, 'first_round_date': None, 'discount_percentage': None, 'is_active': True}
+
+
+PAGES = {
+    1: [scraped(OTHER, 500.0)],
+    2: [scraped(LINK, 900.0)],
+    # Listagem andou durante o crawl: o mesmo lote reaparece na página seguinte, com valor mais novo
+    3: [scraped(LINK, 800.0)],
+}
+
+
+def consume(monitor, order, failed=()):
+    monitor.db_items_by_link = {
+        LINK: {'id': 1, 'external_id': 'j1001', 'value': 1000.0, 'is_active': True, 'auction_round': 1},
+        OTHER: {'id': 2, 'external_id': 'j1002', 'value': 500.0, 'is_active': True, 'auction_round': 1},
+    }
+    
+    async def run():
+        for page_num in order:
+            if page_num in failed:
+                await monitor._release_page('imoveis', page_num, [])
+            else:
+                await monitor._consume_page('imoveis', page_num, PAGES[page_num])
+    asyncio.run(run())
+    return monitor.write_buffer
+
+
+def values(rows, column):
+    """Valores gravados para o lote repetido (item 1)"""
+    return [row[column] for row in rows if row.get('id', row.get('item_id')) == 1]
+
+
+@pytest.mark.parametrize('order', [(1,) + rest for rest in itertools.permutations((2, 3))])
+def test_repeated_link_keeps_lowest_page_whatever_the_completion_order(monitor, order):
+    buffer = consume(monitor, order)
+    
+    assert values(buffer.updates, 'value') == [900.0]
+    assert values(buffer.snapshots, 'current_value') == [900.0]
+    assert monitor.stats['duplicate_links'] == 1
+
+
+def test_pages_wait_for_earlier_page(monitor):
+    buffer = consume(monitor, (3,))
+    assert values(buffer.updates, 'value') == [] and monitor._held_pages['imoveis'].keys() == {3}
+    
+    consume(monitor, (1, 2))
+    assert values(buffer.updates, 'value') == [900.0]
+    assert monitor._held_pages['imoveis'] == {}
+
+
+def test_failed_page_releases_later_pages(monitor):
+    buffer = consume(monitor, (1, 3, 2), failed={2})
+    
+    assert values(buffer.updates, 'value') == [800.0]
+    assert monitor.stats['duplicate_links'] == 0
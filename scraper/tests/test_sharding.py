@@ -0,0 +1,34 @@
+import pytest
+
+from megaleiloes_monitor import shard_for_page
+
+SECTIONS = {'imoveis': 150, 'veiculos': 80, 'bens-de-consumo': 20, 'industrial': 10, 'animais': 5, 'outros': 5}
+BLOCK_PAGES = 10
+
+
+def shard_pages(sections, shard_count):
+    counts = [0] * shard_count
+    for section, max_page in sections.items():
+        for page in range(1, max_page + 1):
+            counts[shard_for_page(section, page, max_page, shard_count)] += 1
+    return counts
+
+
+@pytest.mark.parametrize('shard_count', [1, 2, 3, 4, 6, 8])
+def test_shards_stay_within_one_block_of_fair_share(shard_count):
+    counts = shard_pages(SECTIONS, shard_count)
+    ideal = sum(SECTIONS.values()) / shard_count
+    
+    assert sum(counts) == sum(SECTIONS.values())
+    assert max(abs(count - ideal) for count in counts) <= BLOCK_PAGES
+    # Cada seção desvia no máximo uma página da parte justa
+    assert max(abs(count - ideal) for count in counts) <= len(SECTIONS)
+
+
+def test_shard_assigns_contiguous_ranges():
+    owners = [shard_for_page('imoveis', page, 150, 3) for page in range(1, 151)]
+    changes = sum(1 for previous, current in zip(owners, owners[1:]) if previous != current)
+    
+    assert changes == 2
+    assert sorted(owners.count(shard) for shard in range(3)) == [50, 50, 50]
+
@@ -0,0 +1,187 @@
+"""Funções de supabase/migrations num Postgres local (pgserver) - pulado sem pgserver/psycopg"""
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import FIXTURES_DIR, TESTS_DIR
+
+pgserver = pytest.importorskip('pgserver')
+psycopg = pytest.importorskip('psycopg')
+
+MIGRATIONS_DIR = os.path.join(TESTS_DIR, '..', '..', 'supabase', 'migrations')
+LINK = 'https://www.megaleiloes.com.br/imoveis/apartamentos/sp/sao-paulo/apartamento-1-j1001'
+T0 = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(scope='module')
+def conn(tmp_path_factory):
+    try:
+        server = pgserver.get_server(str(tmp_path_factory.mktemp('pgdata')), cleanup_mode='stop')
+    except Exception as e:
+        pytest.skip(f"Postgres local indisponível: {e}")
+    
+    with psycopg.connect(server.get_uri(), autocommit=True) as connection:
+        with open(os.path.join(FIXTURES_DIR, 'base_schema.sql'), encoding='utf-8') as fh:
+            connection.execute(fh.read())
+        for name in sorted(os.listdir(MIGRATIONS_DIR)):
+            with open(os.path.join(MIGRATIONS_DIR, name), encoding='utf-8') as fh:
+                connection.execute(fh.read())
+        yield connection
+    server.cleanup()
+
+
+@pytest.fixture
+def db(conn):
+    conn.execute("truncate auctions.megaleiloes_monitoring, auctions.megaleiloes_items restart identity")
+    return conn
+
+
+def add_item(db, link=LINK, **columns) -> int:
+    row = {'external_id': link.rsplit('-', 1)[-1], 'source': 'megaleiloes', 'link': link, **columns}
+    names = ', '.join(row)
+    placeholders = ', '.join(['%s'] * len(row))
+    return db.execute(f"insert into auctions.megaleiloes_items ({names}) values ({placeholders}) returning id",
+                      list(row.values())).fetchone()[0]
+
+
+def apply_scraped(db, records, run_id, scraped_at, policy='changes', heartbeat_hours=24) -> dict:
+    return db.execute(
+        "select auctions.megaleiloes_apply_scraped(%s::jsonb, %s, %s, "
+        "array['value', 'has_bid', 'auction_round', 'auction_date', 'is_active'], %s, %s)",
+        (json.dumps(records), run_id, policy, heartbeat_hours, scraped_at),
+    ).fetchone()[0]
+
+
+def scraped(value=1000.0, has_bid=False, link=LINK + '/?origem=listagem', **overrides) -> dict:
+    return {'link': link, 'value': value, 'has_bid': has_bid, 'auction_round': 1,
+            'auction_date': '2026-11-10T15:30:00-03:00', 'first_round_value': None, 'first_round_date': None,
+            'discount_percentage': None, 'is_active': True, **overrides}
+
+
+def item(db, item_id) -> dict:
+    cursor = db.execute("select * from auctions.megaleiloes_items where id = %s", (item_id,))
+    return dict(zip([column.name for column in cursor.description], cursor.fetchone()))
+
+
+def snapshots(db, item_id) -> list:
+    cursor = db.execute("select * from auctions.megaleiloes_monitoring where item_id = %s order by snapshot_at", (item_id,))
+    return [dict(zip([column.name for column in cursor.description], row)) for row in cursor.fetchall()]
+
+
+def test_apply_scraped_first_change_and_suppressed(db):
+    item_id = add_item(db, value=900, has_bid=False, auction_round=1, is_active=True)
+    
+    first = apply_scraped(db, [scraped(), scraped(link='https://www.megaleiloes.com.br/desconhecido')], 'run-1', T0)
+    assert (first['records'], first['matched'], first['snapshots'], first['snapshots_first']) == (2, 1, 1, 1)
+    assert first['updated'] == 1
+    
+    # Mesmo valor numa run seguinte: política 'changes' suprime o snapshot, item só é tocado
+    second = apply_scraped(db, [scraped()], 'run-2', T0 + timedelta(hours=3))
+    assert (second['snapshots'], second['suppressed'], second['touched']) == (0, 1, 1)
+    
+    third = apply_scraped(db, [scraped(value=1100.0, has_bid=True)], 'run-3', T0 + timedelta(hours=6))
+    assert (third['snapshots_change'], third['bid_changes'], third['value_changes'], third['updated']) == (1, 1, 1, 1)
+    
+    rows = snapshots(db, item_id)
+    assert [row['run_id'] for row in rows] == ['run-1', 'run-3']
+    assert float(rows[1]['value_change']) == 100.0
+    assert rows[1]['hours_since_last_snapshot'] == pytest.approx(6)
+    assert float(item(db, item_id)['value']) == 1100.0
+
+
+def test_apply_scraped_uses_scrape_time(db):
+    item_id = add_item(db, value=1000, has_bid=False, auction_round=1, is_active=True)
+    apply_scraped(db, [scraped(value=1200.0)], 'run-1', T0)
+    
+    row = item(db, item_id)
+    assert snapshots(db, item_id)[0]['snapshot_at'] == T0
+    assert row['last_scraped_at'] == T0
+    assert row['updated_at'] == T0
+
+
+def test_apply_scraped_is_idempotent_per_run(db):
+    item_id = add_item(db, value=1000)
+    apply_scraped(db, [scraped()], 'run-1', T0, policy='all')
+    retry = apply_scraped(db, [scraped()], 'run-1', T0, policy='all')
+    
+    assert retry['snapshots'] == 0
+    assert len(snapshots(db, item_id)) == 1
+
+
+def test_apply_scraped_replay_does_not_overwrite_newer_scrape(db):
+    item_id = add_item(db, value=1000)
+    apply_scraped(db, [scraped(value=1500.0)], 'run-2', T0 + timedelta(hours=3))
+    
+    # Lote antigo reenviado pelo journal depois de uma run mais nova
+    replayed = apply_scraped(db, [scraped(value=1200.0)], 'run-1', T0)
+    
+    row = item(db, item_id)
+    assert float(row['value']) == 1500.0
+    assert row['last_scraped_at'] == T0 + timedelta(hours=3)
+    assert replayed['updated'] == replayed['touched'] == 0
+    assert [row['run_id'] for row in snapshots(db, item_id)] == ['run-1', 'run-2']
+
+
+def test_apply_scraped_heartbeat(db):
+    item_id = add_item(db, value=1000)
+    apply_scraped(db, [scraped()], 'run-1', T0)
+    heartbeat = apply_scraped(db, [scraped()], 'run-2', T0 + timedelta(hours=25))
+    
+    assert heartbeat['snapshots_heartbeat'] == 1
+    assert len(snapshots(db, item_id)) == 2
+
+
+def test_bulk_update_items_only_touches_present_columns(db):
+    item_id = add_item(db, value=1000, has_bid=False, auction_round=1, is_active=True)
+    other_id = add_item(db, link=LINK.replace('j1001', 'j1002'), value=50)
+    
+    updated = db.execute("select auctions.megaleiloes_bulk_update_items(%s::jsonb)", (json.dumps([
+        {'id': item_id, 'value': 1200.5, 'auction_round': None},
+        {'id': other_id, 'has_bid': True, 'last_scraped_at': T0.isoformat()},
+    ]),)).fetchone()[0]
+    
+    assert updated == 2
+    row, other = item(db, item_id), item(db, other_id)
+    assert (float(row['value']), row['auction_round'], row['has_bid'], row['is_active']) == (1200.5, None, False, True)
+    assert (float(other['value']), other['has_bid'], other['last_scraped_at']) == (50.0, True, T0)
+
+
+def test_touch_items_sets_only_last_scraped_at(db):
+    item_id = add_item(db, value=1000, updated_at=T0 - timedelta(days=1))
+    untouched_id = add_item(db, link=LINK.replace('j1001', 'j1002'))
+    
+    touched = db.execute("select auctions.megaleiloes_touch_items(%s::jsonb, %s)",
+                         (json.dumps([{'id': item_id}]), T0)).fetchone()[0]
+    
+    assert touched == 1
+    row = item(db, item_id)
+    assert (row['last_scraped_at'], row['updated_at']) == (T0, T0 - timedelta(days=1))
+    assert item(db, untouched_id)['last_scraped_at'] is None
+
+
+def test_latest_snapshots_returns_newest_per_item(db):
+    item_id = add_item(db, value=1000)
+    other_id = add_item(db, link=LINK.replace('j1001', 'j1002'))
+    apply_scraped(db, [scraped(value=1000.0)], 'run-1', T0, policy='all')
+    apply_scraped(db, [scraped(value=1300.0)], 'run-2', T0 + timedelta(hours=1), policy='all')
+    
+    cursor = db.execute("select item_id, run_id, current_value from auctions.megaleiloes_latest_snapshots(%s::jsonb)",
+                        (json.dumps([{'item_id': item_id}, {'item_id': item_id}, {'item_id': other_id}]),))
+    assert [(row[0], row[1], float(row[2])) for row in cursor.fetchall()] == [(item_id, 'run-2', 1300.0)]
+
+
+def test_apply_scraped_keeps_columns_missing_from_record(db):
+    item_id = add_item(db, value=1000, has_bid=False, auction_round=2, is_active=True,
+                       first_round_value=2000, discount_percentage=50)
+    record = scraped(value=1000.0, auction_round=2)
+    for key in ('first_round_value', 'first_round_date', 'discount_percentage'):
+        del record[key]
+    
+    result = apply_scraped(db, [record], 'run-1', T0)
+    
+    row = item(db, item_id)
+    assert (float(row['first_round_value']), float(row['discount_percentage'])) == (2000.0, 50.0)
+    assert float(snapshots(db, item_id)[0]['first_round_value']) == 2000.0
+    assert result['matched'] == 1
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+
+from conftest import FakeSupabase
+from megaleiloes_monitor import StateCache
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def db_item(item_id, updated_at, value=1000.0):
+    return {'id': item_id, 'external_id': f'j{item_id}', 'source': 'megaleiloes', 'value': value,
+            'link': f'https://www.megaleiloes.com.br/imoveis/lote-j{item_id}', 'updated_at': updated_at.isoformat()}
+
+
+def test_state_cache_save_and_load(tmp_path):
+    cache = StateCache(str(tmp_path / 'state.sqlite'))
+    assert cache.invalid_reason(168) == "cache vazio ou de outra versão"
+    
+    items = [db_item(1, NOW), db_item(2, NOW)]
+    snapshots = [{'item_id': 1, 'snapshot_at': NOW.isoformat(), 'current_value': 1000.0}]
+    cache.save(items, snapshots, {'items': NOW, 'snapshots': NOW}, full=True)
+    cache.save([db_item(2, NOW, value=900.0)], [], {'items': NOW + timedelta(minutes=1)})
+    cache.close()
+    
+    cache = StateCache(str(tmp_path / 'state.sqlite'))
+    loaded_items, loaded_snapshots = cache.load()
+    assert sorted((item['id'], item['value']) for item in loaded_items) == [(1, 1000.0), (2, 900.0)]
+    assert loaded_snapshots == snapshots
+    assert cache.watermark('items') == NOW + timedelta(minutes=1)
+    assert cache.watermark('snapshots') == NOW
+    assert cache.invalid_reason(168) is None
+    cache.close()
+
+
+def test_state_cache_expires_after_max_age(tmp_path):
+    cache = StateCache(str(tmp_path / 'state.sqlite'))
+    cache.save([], [], {'items': NOW, 'snapshots': NOW}, full=True)
+    cache.conn.execute("UPDATE meta SET value = ? WHERE key = 'full_sync_at'", ((NOW - timedelta(hours=200)).isoformat(),))
+    
+    assert cache.invalid_reason(168) == "última recarga completa há mais de 168h"
+
+
+def test_scan_since_pages_past_server_row_cap(monitor):
+    rows = [db_item(item_id, NOW + timedelta(seconds=item_id // 3)) for item_id in range(1, 26)]
+    monitor.supabase = FakeSupabase({'megaleiloes_items': rows}, max_rows=4)
+    
+    scanned = monitor._scan_since('megaleiloes_items', '*', 'updated_at', 'id', NOW - timedelta(seconds=1))
+    
+    # Páginas curtas (teto do servidor) e timestamps repetidos não perdem nem repetem linhas
+    assert [row['id'] for row in scanned] == sorted(range(1, 26), key=lambda i: (str(rows[i - 1]['updated_at']), str(i)))
+    assert len({row['id'] for row in scanned}) == 25
+    assert monitor.supabase.queries > 25 // 4
+
+
+def test_full_reload_of_empty_monitoring_table_stores_watermark(monitor, tmp_path):
+    monitor.state_cache_path = str(tmp_path / 'state.sqlite')
+    
+    def load_from_database():
+        monitor._index_db_item(db_item(1, NOW - timedelta(days=1)))
+    monitor._load_state_from_database = load_from_database
+    monitor._load_state()
+    
+    cache = StateCache(monitor.state_cache_path)
+    assert cache.watermark('snapshots') is not None
+    assert cache.invalid_reason(monitor.state_max_age_hours) is None
+    cache.close()
+
+
+def test_incremental_sync_uses_overlap_window(monitor, tmp_path):
+    monitor.state_cache_path = str(tmp_path / 'state.sqlite')
+    monitor.state_overlap_seconds = 600
+    cache = StateCache(monitor.state_cache_path)
+    cache.save([db_item(1, NOW), db_item(2, NOW)], [], {'items': NOW, 'snapshots': NOW}, full=True)
+    cache.close()
+    
+    # Commit atrasado (5 min antes do watermark) entra pela folga; 20 min antes não
+    late, old, new = db_item(1, NOW - timedelta(minutes=5), 1500.0), db_item(2, NOW - timedelta(minutes=20), 1.0), \
+        db_item(3, NOW + timedelta(minutes=1), 700.0)
+    monitor.supabase = FakeSupabase({'megaleiloes_items': [late, old, new]})
+    monitor._load_state()
+    
+    assert monitor.db_items_by_id[1]['value'] == 1500.0
+    assert monitor.db_items_by_id[2]['value'] == 1000.0
+    assert monitor.db_items_by_id[3]['value'] == 700.0
+    
+    cache = StateCache(monitor.state_cache_path)
+    assert cache.watermark('items') == NOW + timedelta(minutes=1)
+    assert cache.watermark('snapshots') == NOW
+    cache.close()
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from megaleiloes_monitor import BackgroundWriter, MegaLeiloesMonitor, WriteBuffer, WriteJournal
+
+
+def _buffer(write_snapshots, max_pending=1):
+    return WriteBuffer(write_snapshots, lambda rows: [], lambda rows: [], batch_size=1,
+                       writer=BackgroundWriter(max_pending, stats={}, stats_lock=threading.Lock()))
+
+
+def test_full_writer_queue_does_not_block_event_loop():
+    written = []
+    
+    def slow_write(rows):
+        time.sleep(0.2)
+        written.extend(rows)
+        return []
+    
+    buffer = _buffer(slow_write)
+    
+    async def produce():
+        buffer.defer_submits()
+        ticks = 0
+        
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        
+        task = asyncio.create_task(ticker())
+        for row in range(4):
+            buffer.add_snapshot({'item_id': row})
+            await buffer.submit_pending()
+        await buffer.stop_deferring()
+        task.cancel()
+        return ticks
+    
+    ticks = asyncio.run(produce())
+    buffer.flush()
+    
+    # Fila de 1 lote com escrita de 0.2s: o produtor esperou, mas o loop continuou rodando
+    assert ticks >= 10
+    assert written == [{'item_id': row} for row in range(4)]
+    assert buffer.writer.stats['write_backpressure_seconds'] > 0
+
+
+def test_writer_errors_are_counted():
+    def failing_write(rows):
+        raise RuntimeError('boom')
+    
+    buffer = _buffer(failing_write)
+    buffer.add_snapshot({'item_id': 1})
+    buffer.flush()
+    
+    assert buffer.writer.stats['errors'] == 1
+
+
+class _ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+@pytest.mark.parametrize('code, transient', [
+    ('23505', False), ('22P02', False), ('42703', False), ('PGRST204', False), (400, False), ('413', False),
+    ('57014', True), ('08006', True), (408, True), (429, True), (503, True), (None, True),
+])
+def test_transient_write_error_classification(code, transient):
+    assert MegaLeiloesMonitor._is_transient_write_error(_ApiError(code)) is transient
+
+
+def test_journal_replays_records_with_original_run_and_scrape_time(tmp_path):
+    meta = {'run_id': 'gh-1', 'scraped_at': '2026-10-01T12:00:00+00:00'}
+    failing = WriteBuffer(None, None, None, write_records=lambda rows, **kwargs: rows,
+                          journal=WriteJournal(str(tmp_path)), record_meta=lambda: meta)
+    failing.add_record({'link': 'https://www.megaleiloes.com.br/x-j1'})
+    failing.flush()
+    failing.journal.close()
+    
+    calls = []
+    journal = WriteJournal(str(tmp_path))
+    assert journal.replay({'records': lambda rows, **kwargs: calls.append((rows, kwargs))}) == 1
+    assert calls == [([{'link': 'https://www.megaleiloes.com.br/x-j1'}], meta)]
+    assert not journal.pending
+
+
+def test_journal_keeps_acks_of_older_segments(tmp_path):
+    journal = WriteJournal(str(tmp_path), segment_bytes=1, fsync=False)
+    old, newer = journal.append('snapshots', [1]), journal.append('snapshots', [2])
+    journal.ack(newer)
+    journal.close()
+    
+    # O ack do lote 'newer' está num segmento posterior ao lote 'old', ainda pendente
+    assert sorted(WriteJournal(str(tmp_path)).pending) == [old]
+
+
+class _FakeRpc:
+    """rpc(...).execute() que falha com os erros dados, na ordem, e depois devolve o tamanho do lote"""
+    
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = []
+    
+    def schema(self, name):
+        return self
+    
+    def rpc(self, name, params):
+        self.calls.append(params)
+        return self
+    
+    def execute(self):
+        if self.errors:
+            raise self.errors.pop(0)
+        return type('Response', (), {'data': len(self.calls[-1]['p_items'])})
+
+
+def test_touch_items_retry_transient_errors(monitor, monkeypatch):
+    monkeypatch.setattr(time, 'sleep', lambda seconds: None)
+    monitor.supabase = _FakeRpc([_ApiError(503)])
+    
+    assert monitor._touch_items_batch([1, 2, 3]) == []
+    assert len(monitor.supabase.calls) == 2
+    assert monitor.stats['items_touched'] == 3
+
+
+def test_touch_items_keep_ids_pending_when_database_is_down(monitor, monkeypatch):
+    monkeypatch.setattr(time, 'sleep', lambda seconds: None)
+    monitor.write_retries = 1
+    monitor.supabase = _FakeRpc([_ApiError(503)] * 2)
+    
+    assert monitor._touch_items_batch([1, 2, 3]) == [1, 2, 3]
+
+
+def test_touch_items_isolate_rejected_id(monitor):
+    monitor.supabase = _FakeRpc([_ApiError('22P02')])
+    
+    # Erro de dados não é retentado: divide o lote e grava o resto
+    assert monitor._touch_items_batch([1, 2]) == []
+    assert monitor.stats['items_touched'] == 2
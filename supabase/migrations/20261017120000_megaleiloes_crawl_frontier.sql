@@ -0,0 +1,118 @@
+-- Fronteira do crawl distribuído: unidades (seção, página) de uma run, reivindicadas por workers com lease
+
+create table if not exists auctions.megaleiloes_frontier (
+    run_id           text        not null,
+    section          text        not null,
+    page             integer     not null,
+    status           text        not null default 'pending',  -- pending | leased | done | failed
+    lease_owner      text,
+    lease_expires_at timestamptz,
+    attempts         integer     not null default 0,
+    items            jsonb,
+    last_error       text,
+    updated_at       timestamptz not null default now(),
+    primary key (run_id, section, page)
+);
+
+create index if not exists megaleiloes_frontier_open_idx
+    on auctions.megaleiloes_frontier (run_id, page)
+    where status in ('pending', 'leased');
+
+
+-- Insere as páginas [p_first, p_last] da seção; idempotente (vários workers podem semear a mesma seção)
+create or replace function auctions.megaleiloes_frontier_seed(
+    p_run_id text, p_section text, p_first integer, p_last integer
+) returns void
+language sql as $$
+    insert into auctions.megaleiloes_frontier (run_id, section, page)
+    select p_run_id, p_section, g from generate_series(p_first, p_last) g
+    on conflict do nothing;
+$$;
+
+
+-- Reivindica até p_limit unidades livres (pendentes ou com lease vencido) sem bloquear os outros workers
+create or replace function auctions.megaleiloes_frontier_claim(
+    p_run_id text, p_worker text, p_limit integer, p_lease_seconds integer, p_max_attempts integer
+) returns table (section text, page integer, attempts integer)
+language sql as $$
+    with claimable as (
+        select f.section, f.page
+          from auctions.megaleiloes_frontier f
+         where f.run_id = p_run_id
+           and f.attempts < p_max_attempts
+           and (f.status = 'pending' or (f.status = 'leased' and f.lease_expires_at < now()))
+         order by f.page, f.section
+         limit p_limit
+           for update skip locked
+    )
+    update auctions.megaleiloes_frontier f
+       set status = 'leased',
+           lease_owner = p_worker,
+           lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+           attempts = f.attempts + 1,
+           updated_at = now()
+      from claimable c
+     where f.run_id = p_run_id and f.section = c.section and f.page = c.page
+    returning f.section, f.page, f.attempts;
+$$;
+
+
+-- Renova o lease das unidades ainda em posse do worker; p_units = [{"section": ..., "page": ...}]
+create or replace function auctions.megaleiloes_frontier_heartbeat(
+    p_run_id text, p_worker text, p_units jsonb, p_lease_seconds integer
+) returns integer
+language sql as $$
+    with renewed as (
+        update auctions.megaleiloes_frontier f
+           set lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+               updated_at = now()
+          from jsonb_to_recordset(p_units) as u(section text, page integer)
+         where f.run_id = p_run_id and f.section = u.section and f.page = u.page
+           and f.status = 'leased' and f.lease_owner = p_worker
+        returning 1
+    )
+    select count(*)::integer from renewed;
+$$;
+
+
+-- Resultado de uma unidade: o primeiro resultado vale, mesmo vindo de um lease já vencido
+create or replace function auctions.megaleiloes_frontier_complete(
+    p_run_id text, p_worker text, p_section text, p_page integer, p_items jsonb
+) returns boolean
+language sql as $$
+    with done as (
+        update auctions.megaleiloes_frontier
+           set status = 'done', items = p_items, lease_owner = p_worker, lease_expires_at = null, updated_at = now()
+         where run_id = p_run_id and section = p_section and page = p_page and status <> 'done'
+        returning 1
+    )
+    select exists (select 1 from done);
+$$;
+
+
+-- Falha de uma unidade: volta para a fila até esgotar as tentativas
+create or replace function auctions.megaleiloes_frontier_fail(
+    p_run_id text, p_worker text, p_section text, p_page integer, p_error text, p_max_attempts integer
+) returns void
+language sql as $$
+    update auctions.megaleiloes_frontier
+       set status = case when attempts >= p_max_attempts then 'failed' else 'pending' end,
+           lease_owner = null, lease_expires_at = null, last_error = p_error, updated_at = now()
+     where run_id = p_run_id and section = p_section and page = p_page
+       and status = 'leased' and lease_owner = p_worker;
+$$;
+
+
+-- Unidades ainda em aberto (livres, ou em lease vivo, ou com lease vencido e tentativas sobrando)
+create or replace function auctions.megaleiloes_frontier_open_count(
+    p_run_id text, p_max_attempts integer
+) returns integer
+language sql stable as $$
+    select count(*)::integer
+      from auctions.megaleiloes_frontier
+     where run_id = p_run_id
+       and (
+            (status = 'pending' and attempts < p_max_attempts)
+         or (status = 'leased' and (lease_expires_at >= now() or attempts < p_max_attempts))
+       );
+$$;
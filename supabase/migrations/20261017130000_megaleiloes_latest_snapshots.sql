@@ -0,0 +1,31 @@
+-- Último snapshot por item sem ler o histórico: índice (item_id, snapshot_at desc) + uma busca por item
+
+create index if not exists megaleiloes_monitoring_item_snapshot_idx
+    on auctions.megaleiloes_monitoring (item_id, snapshot_at desc);
+
+
+-- p_items = [{"item_id": ...}, ...] no corpo do POST (sem limite de URL do .in_());
+-- jsonb_populate_recordset tipa item_id pela própria tabela, seja bigint ou uuid
+create or replace function auctions.megaleiloes_latest_snapshots(p_items jsonb)
+returns setof auctions.megaleiloes_monitoring
+language sql stable as $$
+    select s.*
+      from (
+            select distinct r.item_id
+              from jsonb_populate_recordset(null::auctions.megaleiloes_monitoring, p_items) r
+           ) ids
+     cross join lateral (
+            select m.*
+              from auctions.megaleiloes_monitoring m
+             where m.item_id = ids.item_id
+             order by m.snapshot_at desc
+             limit 1
+           ) s;
+$$;
+
+
+-- Mesmo resultado para consultas ad hoc
+create or replace view auctions.megaleiloes_latest_snapshot as
+    select distinct on (item_id) *
+      from auctions.megaleiloes_monitoring
+     order by item_id, snapshot_at desc;
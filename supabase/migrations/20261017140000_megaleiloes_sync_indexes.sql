@@ -0,0 +1,7 @@
+-- Sync incremental do cache local: varreduras keyset por (updated_at, id) e (snapshot_at, item_id)
+
+create index if not exists megaleiloes_items_updated_at_idx
+    on auctions.megaleiloes_items (updated_at, id);
+
+create index if not exists megaleiloes_monitoring_snapshot_at_idx
+    on auctions.megaleiloes_monitoring (snapshot_at, item_id);
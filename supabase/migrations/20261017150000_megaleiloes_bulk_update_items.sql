@@ -0,0 +1,29 @@
+-- Update em massa da tabela base: um POST com o array de updates em vez de um request por item.
+-- Cada update só altera as colunas presentes no objeto (null explícito grava null).
+
+create or replace function auctions.megaleiloes_bulk_update_items(p_updates jsonb)
+returns integer
+language sql as $$
+    with src as (
+        select e.doc, r.*
+          from jsonb_array_elements(p_updates) as e(doc)
+         cross join lateral jsonb_populate_record(null::auctions.megaleiloes_items, e.doc) r
+    ),
+    updated as (
+        update auctions.megaleiloes_items i
+           set value               = case when s.doc ? 'value' then s.value else i.value end,
+               has_bid             = case when s.doc ? 'has_bid' then s.has_bid else i.has_bid end,
+               auction_round       = case when s.doc ? 'auction_round' then s.auction_round else i.auction_round end,
+               auction_date        = case when s.doc ? 'auction_date' then s.auction_date else i.auction_date end,
+               first_round_value   = case when s.doc ? 'first_round_value' then s.first_round_value else i.first_round_value end,
+               first_round_date    = case when s.doc ? 'first_round_date' then s.first_round_date else i.first_round_date end,
+               discount_percentage = case when s.doc ? 'discount_percentage' then s.discount_percentage else i.discount_percentage end,
+               is_active           = case when s.doc ? 'is_active' then s.is_active else i.is_active end,
+               updated_at          = case when s.doc ? 'updated_at' then s.updated_at else i.updated_at end,
+               last_scraped_at     = case when s.doc ? 'last_scraped_at' then s.last_scraped_at else i.last_scraped_at end
+          from src s
+         where i.id = s.id
+        returning 1
+    )
+    select count(*)::integer from updated;
+$$;
@@ -0,0 +1,16 @@
+-- Itens vistos sem mudança: só last_scraped_at, num único UPDATE ... WHERE id = ANY(...)
+-- (updated_at fica intacto - o sync incremental do cache local não os recarrega)
+
+create or replace function auctions.megaleiloes_touch_items(p_items jsonb, p_scraped_at timestamptz)
+returns integer
+language sql as $$
+    with touched as (
+        update auctions.megaleiloes_items
+           set last_scraped_at = p_scraped_at
+         where id = any (array(
+                select r.id from jsonb_populate_recordset(null::auctions.megaleiloes_items, p_items) r
+               ))
+        returning 1
+    )
+    select count(*)::integer from touched;
+$$;
@@ -0,0 +1,8 @@
+-- Snapshots com escopo de run: (item_id, run_id) único torna retries e runs sobrepostas idempotentes
+-- (linhas antigas ficam com run_id null e não conflitam entre si)
+
+alter table auctions.megaleiloes_monitoring
+    add column if not exists run_id text;
+
+create unique index if not exists megaleiloes_monitoring_item_run_key
+    on auctions.megaleiloes_monitoring (item_id, run_id);
@@ -0,0 +1,160 @@
+-- Modo servidor do monitor (MEGA_WRITE_MODE=server): o cliente só envia os registros scrapados;
+-- match por link normalizado, diff, snapshot (com a política de snapshot) e update da base numa transação por lote.
+-- p_scraped_at é o momento do scrape do lote (não o do envio): um lote reenviado pelo journal mantém o horário
+-- original, compara só com snapshots até ele e não sobrescreve itens que um scrape mais novo já atualizou.
+-- Coluna ausente no registro (payload JSON que não a traz) vale o que está na base: nem diff nem null gravado.
+
+create index if not exists megaleiloes_items_link_norm_idx
+    on auctions.megaleiloes_items ((rtrim(split_part(link, '?', 1), '/')))
+    where source = 'megaleiloes';
+
+
+create or replace function auctions.megaleiloes_apply_scraped(
+    p_records jsonb,
+    p_run_id text,
+    p_policy text default 'changes',
+    p_fields text[] default array['value', 'has_bid', 'auction_round', 'auction_date', 'is_active'],
+    p_heartbeat_hours double precision default 24,
+    p_scraped_at timestamptz default now()
+) returns jsonb
+language sql as $$
+    with src as (
+        -- Registros tipados pela própria tabela base; um por link normalizado
+        select distinct on (link_norm) e.doc, r.*, rtrim(split_part(r.link, '?', 1), '/') as link_norm
+          from jsonb_array_elements(p_records) as e(doc)
+         cross join lateral jsonb_populate_record(null::auctions.megaleiloes_items, e.doc) r
+         where r.link is not null
+         order by link_norm
+    ),
+    matched as (
+        select case when s.doc ? 'value' then s.value else i.value end as value,
+               case when s.doc ? 'has_bid' then s.has_bid else i.has_bid end as has_bid,
+               case when s.doc ? 'auction_round' then s.auction_round else i.auction_round end as auction_round,
+               case when s.doc ? 'auction_date' then s.auction_date else i.auction_date end as auction_date,
+               case when s.doc ? 'first_round_value' then s.first_round_value else i.first_round_value end as first_round_value,
+               case when s.doc ? 'first_round_date' then s.first_round_date else i.first_round_date end as first_round_date,
+               case when s.doc ? 'discount_percentage' then s.discount_percentage else i.discount_percentage end
+                   as discount_percentage,
+               case when s.doc ? 'is_active' then s.is_active else i.is_active end as is_active,
+               i.id as item_id, i.external_id, i.category, i.city, i.state, i.auction_type,
+               i.value as db_value, i.has_bid as db_has_bid, i.auction_round as db_round,
+               i.auction_date as db_auction_date, i.first_round_value as db_first_round_value,
+               i.first_round_date as db_first_round_date, i.discount_percentage as db_discount_percentage,
+               i.is_active as db_is_active,
+               l.snapshot_at as last_at, l.current_value as last_value, l.has_bid as last_has_bid,
+               l.auction_round as last_round, l.auction_date as last_auction_date, l.is_active as last_is_active,
+               l.item_id is not null as has_last
+          from src s
+          join auctions.megaleiloes_items i
+            on i.source = 'megaleiloes' and rtrim(split_part(i.link, '?', 1), '/') = s.link_norm
+          left join lateral (
+                select m.snapshot_at, m.current_value, m.has_bid, m.auction_round, m.auction_date, m.is_active, m.item_id
+                  from auctions.megaleiloes_monitoring m
+                 where m.item_id = i.id
+                   and m.snapshot_at <= p_scraped_at
+                 order by m.snapshot_at desc
+                 limit 1
+               ) l on true
+    ),
+    base as (
+        -- Valores anteriores: último snapshot, ou a linha da base para itens sem snapshot
+        select m.*,
+               case when has_last then last_value else db_value end as old_value,
+               case when has_last then last_has_bid else coalesce(db_has_bid, false) end as old_has_bid,
+               case when has_last then last_round else db_round end as old_round,
+               case when has_last then last_auction_date else db_auction_date end as old_auction_date,
+               case when has_last then last_is_active else coalesce(db_is_active, true) end as old_is_active,
+               extract(epoch from p_scraped_at - last_at) / 3600 as hours_since_last
+          from matched m
+    ),
+    diff as (
+        select b.*,
+               case when coalesce(old_value, 0) <> 0 and coalesce(value, 0) <> 0 then value - old_value end as value_change,
+               coalesce(has_bid, false) is distinct from old_has_bid as bid_status_changed,
+               auction_round is distinct from old_round as round_changed,
+               auction_date is distinct from old_auction_date as auction_date_changed,
+               coalesce(is_active, true) is distinct from old_is_active as status_changed,
+               (round(value, 2) is distinct from round(db_value, 2)
+                 or has_bid is distinct from db_has_bid
+                 or auction_round is distinct from db_round
+                 or auction_date is distinct from db_auction_date
+                 or round(first_round_value, 2) is distinct from round(db_first_round_value, 2)
+                 or first_round_date is distinct from db_first_round_date
+                 or round(discount_percentage, 2) is distinct from round(db_discount_percentage, 2)
+                 or is_active is distinct from db_is_active) as item_changed
+          from base b
+    ),
+    decided as (
+        select d.*,
+               case
+                   when p_policy = 'all' then 'all'
+                   when not has_last then 'first'
+                   when ('value' = any(p_fields) and round(value, 2) is distinct from round(last_value, 2))
+                     or ('has_bid' = any(p_fields) and has_bid is distinct from last_has_bid)
+                     or ('auction_round' = any(p_fields) and auction_round is distinct from last_round)
+                     or ('auction_date' = any(p_fields) and auction_date is distinct from last_auction_date)
+                     or ('is_active' = any(p_fields) and is_active is distinct from last_is_active) then 'change'
+                   when p_scraped_at - last_at >= make_interval(secs => p_heartbeat_hours * 3600) then 'heartbeat'
+               end as reason
+          from diff d
+    ),
+    inserted as (
+        insert into auctions.megaleiloes_monitoring (
+            item_id, external_id, snapshot_at, days_until_auction, current_value, value_change, value_change_percentage,
+            first_round_value, discount_from_first_round, has_bid, bid_status_changed, auction_round, round_changed,
+            auction_date, auction_date_changed, is_active, status_changed, category, city, state, auction_type,
+            hours_since_last_snapshot, value_velocity, metadata, run_id
+        )
+        select item_id, external_id, p_scraped_at,
+               floor(extract(epoch from auction_date - p_scraped_at) / 86400)::integer,
+               value, value_change,
+               case when value_change is not null and old_value > 0 then value_change / old_value * 100 end,
+               first_round_value,
+               case when coalesce(value, 0) <> 0 and first_round_value > 0
+                    then (first_round_value - value) / first_round_value * 100 end,
+               coalesce(has_bid, false), bid_status_changed, auction_round, round_changed,
+               auction_date, auction_date_changed, coalesce(is_active, true), status_changed,
+               category, city, state, auction_type,
+               hours_since_last,
+               case when coalesce(value_change, 0) <> 0 and hours_since_last > 0 then value_change / hours_since_last end,
+               jsonb_build_object('source', 'automated_monitoring', 'run_id', p_run_id, 'mode', 'server'),
+               p_run_id
+          from decided
+         where reason is not null
+        on conflict (item_id, run_id) do nothing
+        returning item_id
+    ),
+    updated as (
+        -- Todo item visto ganha last_scraped_at; colunas e updated_at só mudam quando algo mudou
+        update auctions.megaleiloes_items i
+           set value               = d.value,
+               has_bid             = d.has_bid,
+               auction_round       = d.auction_round,
+               auction_date        = d.auction_date,
+               first_round_value   = d.first_round_value,
+               first_round_date    = d.first_round_date,
+               discount_percentage = d.discount_percentage,
+               is_active           = d.is_active,
+               updated_at          = case when d.item_changed then p_scraped_at else i.updated_at end,
+               last_scraped_at     = p_scraped_at
+          from decided d
+         where i.id = d.item_id
+           and (i.last_scraped_at is null or i.last_scraped_at <= p_scraped_at)
+        returning d.item_changed
+    )
+    select jsonb_build_object(
+        'records',          (select count(*) from src),
+        'matched',          (select count(*) from decided),
+        'snapshots',        (select count(*) from inserted),
+        'snapshots_all',    (select count(*) from decided where reason = 'all'),
+        'snapshots_first',  (select count(*) from decided where reason = 'first'),
+        'snapshots_change', (select count(*) from decided where reason = 'change'),
+        'snapshots_heartbeat', (select count(*) from decided where reason = 'heartbeat'),
+        'suppressed',       (select count(*) from decided where reason is null),
+        'bid_changes',      (select count(*) from decided where reason is not null and bid_status_changed),
+        'value_changes',    (select count(*) from decided where reason is not null and coalesce(value_change, 0) <> 0),
+        'status_changes',   (select count(*) from decided where reason is not null and status_changed),
+        'updated',          (select count(*) from updated where item_changed),
+        'touched',          (select count(*) from updated where not item_changed)
+    );
+$$;